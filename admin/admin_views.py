@@ -4,6 +4,7 @@ import sys
 # Додаємо корінь проекту до шляхів
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from flask import url_for
 from flask_admin import Admin
 from flask_admin.theme import Bootstrap4Theme
 from flask_admin.contrib.sqla import ModelView
@@ -14,9 +15,19 @@ from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import DataRequired
 from markupsafe import Markup
+from sqlalchemy import delete
 
 # Імпортуємо моделі ПІСЛЯ ініціалізації db, щоб уникнути циклічних імпортів
-from core.models import User, Product, Order, Category, StaticPage, GlobalSettings, Translation, Farm, Transaction, TransactionType, TransactionStatus, CartItem, OrderItem, Region
+from core.utils.catalog_snapshot import catalog_snapshot
+from core.utils.catalog_search import catalog_search
+from core.utils.images import image_url, generate_derivatives, remove_derivatives
+from core.models import User, Product, Order, Category, StaticPage, GlobalSettings, Translation, Farm, Transaction, TransactionType, TransactionStatus, CartItem, OrderItem, Region, TelegramFileCache, AdminJob
+
+# Admin lists show the 100x100 thumbnail derivative instead of the full upload
+def _thumbnail_formatter(view, context, model, name):
+    if not model.image_path:
+        return 'No image'
+    return Markup(f'<img src="{image_url(model.image_path, "thumb")}" width="50" height="50" loading="lazy" alt="No image">')
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
@@ -27,8 +38,35 @@ class SecureModelView(ModelView):
     def is_accessible(self):
         return current_user.is_authenticated and current_user.is_admin
 
+    # Keep the WebApp catalog snapshot in sync with admin edits
+    def after_model_change(self, form, model, is_created):
+        catalog_snapshot.invalidate_for_model(self.model)
+        super().after_model_change(form, model, is_created)
+
+    def after_model_delete(self, model):
+        catalog_snapshot.invalidate_for_model(self.model)
+        super().after_model_delete(model)
+
+# Базова в'юха для моделей із завантаженням зображень
+class ImageModelView(SecureModelView):
+    def on_model_change(self, form, model, is_created):
+        # A new upload drops the stored Telegram file_ids of the old and new paths
+        # (a running bot notices the changed mtime by itself; this keeps the table clean for its next start)
+        image_field = getattr(form, 'image_path', None)
+        uploaded = image_field is not None and getattr(image_field.data, 'filename', None)
+        if uploaded or (image_field is not None and image_field.object_data != model.image_path):
+            paths = {p for p in (image_field.object_data, model.image_path) if p}
+            if paths:
+                self.session.execute(delete(TelegramFileCache).where(TelegramFileCache.image_path.in_(paths)))
+            # Resized/WebP derivatives: drop the old ones, render the new upload right away
+            for path in paths:
+                remove_derivatives(path)
+            if model.image_path:
+                generate_derivatives(model.image_path)
+        super().on_model_change(form, model, is_created)
+
 # Кастомна в'юха для продуктів
-class ProductView(SecureModelView):
+class ProductView(ImageModelView):
     column_list = ('id', 'name', 'name_de', 'price', 'unit', 'sku', 'availability_status', 'categories', 'farm', 'image_path')
     column_display_pk = True
     column_default_sort = ('id', False)
@@ -52,14 +90,25 @@ class ProductView(SecureModelView):
     }
     column_formatters = {
         'price': lambda v, c, m, p: f"{m.price:.2f} €".replace('.', ',') if m.price else '0,00 €',
-        'image_path': lambda v, c, m, p: Markup(f'<img src="/static/uploads/{m.image_path}" width="50" height="50" alt="No image">') if m.image_path else 'No image'
+        'image_path': _thumbnail_formatter
     }
     form_extra_fields = {
         'image_path': FileUploadField('Зображення', base_path='static/uploads')
     }
 
+    # Single product edits update the WebApp search index in place instead of a full rebuild
+    def after_model_change(self, form, model, is_created):
+        before = catalog_snapshot.generation('products')
+        super().after_model_change(form, model, is_created)
+        catalog_search.apply_product_change(self.session, model.id, before, catalog_snapshot.generation('products'))
+
+    def after_model_delete(self, model):
+        before = catalog_snapshot.generation('products')
+        super().after_model_delete(model)
+        catalog_search.apply_product_delete(model.id, before, catalog_snapshot.generation('products'))
+
 # Кастомна в'юха для категорій
-class CategoryView(SecureModelView):
+class CategoryView(ImageModelView):
     column_labels = {
         'id': 'ID',
         'name': 'Назва (Укр)',
@@ -71,7 +120,7 @@ class CategoryView(SecureModelView):
         'image_path': 'Шлях до зображення'
     }
     column_formatters = {
-        'image_path': lambda v, c, m, p: Markup(f'<img src="/static/uploads/{m.image_path}" width="50" height="50" alt="No image">') if m.image_path else 'No image'
+        'image_path': _thumbnail_formatter
     }
     form_extra_fields = {
         'image_path': FileUploadField('Зображення', base_path='static/uploads', allowed_extensions=['jpg', 'jpeg', 'png', 'gif'])
@@ -87,7 +136,7 @@ class RegionView(SecureModelView):
     }
 
 # Кастомна в'юха для ферм
-class FarmView(SecureModelView):
+class FarmView(ImageModelView):
     column_list = ('id', 'name', 'region', 'farm_type', 'location', 'contact_info', 'is_active', 'image_path')
     column_labels = {
         'id': 'ID',
@@ -102,7 +151,7 @@ class FarmView(SecureModelView):
         'farm_type': 'Тип ферми'
     }
     column_formatters = {
-        'image_path': lambda v, c, m, p: Markup(f'<img src="/static/uploads/{m.image_path}" width="50" height="50" alt="No image">') if m.image_path else 'No image'
+        'image_path': _thumbnail_formatter
     }
     form_extra_fields = {
         'image_path': FileUploadField('Зображення', base_path='static/uploads', allowed_extensions=['jpg', 'jpeg', 'png', 'gif'])
@@ -138,4 +187,29 @@ class TransactionView(SecureModelView):
         'status': 'Статус',
         'external_id': 'Зовнішній ID',
         'created_at': 'Дата створення'
-    }
\ No newline at end of file
+    }
+
+# Фонові задачі імпорту/експорту: лише перегляд, керування на сторінці задачі
+class AdminJobView(SecureModelView):
+    can_create = False
+    can_edit = False
+    can_delete = False
+    column_list = ('id', 'kind', 'status', 'user', 'rows_done', 'rows_total', 'errors_count', 'created_at', 'finished_at', 'snapshot_path')
+    column_default_sort = ('id', True)
+    column_filters = ['kind', 'status']
+    column_labels = {
+        'id': 'ID',
+        'kind': 'Тип',
+        'status': 'Статус',
+        'user': 'Користувач',
+        'rows_done': 'Оброблено',
+        'rows_total': 'Всього',
+        'errors_count': 'Помилок',
+        'created_at': 'Створено',
+        'finished_at': 'Завершено',
+        'snapshot_path': 'Знімок'
+    }
+    column_formatters = {
+        'id': lambda v, c, m, p: Markup(f'<a href="{url_for("admin_api.job_status", job_id=m.id)}">#{m.id}</a>'),
+        'snapshot_path': lambda v, c, m, p: 'так' if m.snapshot_path else ''
+    }
@@ -10,6 +10,8 @@ from dotenv import load_dotenv
 
 # Import shared extensions
 from extensions import db, login_manager, limiter, admin
+from admin.compression import init_compression
+from admin.jobs import init_jobs
 
 load_dotenv()
 
@@ -17,6 +19,21 @@ app = Flask(__name__, template_folder='../templates', static_folder='../static')
 
 app.config['SECRET_KEY'] = os.getenv("SECRET_KEY")
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB limit
+# Cache-Control for the WebApp read APIs (validated with ETag / If-None-Match)
+app.config['WEBAPP_API_CACHE_CONTROL'] = os.getenv("WEBAPP_API_CACHE_CONTROL", "public, max-age=60, stale-while-revalidate=600")
+# Upper bound for `limit` on paginated catalog endpoints
+app.config['WEBAPP_API_MAX_PAGE_SIZE'] = int(os.getenv("WEBAPP_API_MAX_PAGE_SIZE", "100"))
+# Responses smaller than this are sent uncompressed
+app.config['COMPRESSION_MIN_SIZE'] = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Cache-Control for resized image derivatives under /media: bare or outdated URLs,
+# and content-hashed URLs (their bytes never change, so they are cached for a year)
+app.config['MEDIA_CACHE_CONTROL'] = os.getenv("MEDIA_CACHE_CONTROL", "public, max-age=86400")
+app.config['MEDIA_HASHED_CACHE_CONTROL'] = os.getenv("MEDIA_HASHED_CACHE_CONTROL", "public, max-age=31536000, immutable")
+# Background import/export jobs: worker threads, where uploads and results are kept, and for how long
+app.config['ADMIN_JOB_WORKERS'] = int(os.getenv("ADMIN_JOB_WORKERS", "2"))
+app.config['ADMIN_JOB_DIR'] = os.getenv("ADMIN_JOB_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'instance', 'jobs')))
+app.config['ADMIN_JOB_RETENTION_DAYS'] = int(os.getenv("ADMIN_JOB_RETENTION_DAYS", "7"))
+app.config['ADMIN_JOB_STALE_SECONDS'] = int(os.getenv("ADMIN_JOB_STALE_SECONDS", "3600"))
 
 # Налаштування бази
 DATABASE_URL = os.getenv("DATABASE_URL").replace("postgresql+asyncpg", "postgresql")
@@ -36,6 +53,8 @@ login_manager.init_app(app)
 login_manager.login_view = 'admin_api.login'
 limiter.init_app(app)
 admin.init_app(app)
+init_compression(app)
+init_jobs(app)
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -45,10 +64,10 @@ def load_user(user_id):
         return session.execute(select(User).where(User.id == int(user_id))).scalar_one_or_none()
 
 # Імпортуємо моделі ПІСЛЯ ініціалізації db, щоб уникнути циклічних імпортів
-from core.models import User, Product, Order, Category, StaticPage, GlobalSettings, Translation, Farm, Transaction, TransactionType, TransactionStatus, CartItem, OrderItem, Region
+from core.models import User, Product, Order, Category, StaticPage, GlobalSettings, Translation, Farm, Transaction, TransactionType, TransactionStatus, CartItem, OrderItem, Region, AdminJob
 
 # Import views and routes
-from admin.admin_views import UserView, ProductView, FarmView, CategoryView, TransactionView, SecureModelView, RegionView
+from admin.admin_views import UserView, ProductView, FarmView, CategoryView, TransactionView, SecureModelView, RegionView, AdminJobView
 from admin.routes import admin_api
 
 
@@ -71,6 +90,7 @@ admin.add_view(SecureModelView(OrderItem, db.session))
 admin.add_view(SecureModelView(StaticPage, db.session))
 admin.add_view(SecureModelView(GlobalSettings, db.session))
 admin.add_view(SecureModelView(Translation, db.session))
+admin.add_view(AdminJobView(AdminJob, db.session, name='Фонові задачі'))
 
 if __name__ == '__main__':
     print("🚀 Running on http://localhost:5000/admin")
@@ -0,0 +1,144 @@
+import gzip
+import os
+import threading
+import weakref
+
+from flask import Response, request, current_app
+from werkzeug.utils import safe_join
+
+try:
+    import brotli
+except ImportError:
+    # Brotli is optional: without it responses fall back to gzip
+    brotli = None
+
+# Negotiated response compression.
+# Cached payloads (catalog snapshot entries, the WebApp shell) and static files are compressed
+# once per encoding at the highest level and reused; other responses are compressed on the fly
+# at a fast level.
+
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'text/html', 'text/css', 'text/plain', 'text/javascript',
+    'application/javascript', 'image/svg+xml'
+}
+
+# payload -> (lock, {encoding: compressed bytes}); dropped together with the payload
+_variants = weakref.WeakKeyDictionary()
+_variants_lock = threading.Lock()
+# (file path, encoding) -> ((mtime, size), compressed bytes); a changed file replaces its entry
+_files = {}
+_files_lock = threading.Lock()
+SIBLING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+def compress(body: bytes, encoding: str, best: bool = False) -> bytes:
+    """Compress bytes with the given content-coding; `best` trades CPU for size (use for cached payloads)."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=9 if best else 5)
+    # mtime=0 keeps the output byte-identical between processes
+    return gzip.compress(body, compresslevel=9 if best else 6, mtime=0)
+
+def choose_encoding(size: int):
+    """Pick the best encoding the client accepts, or None if the body is too small to bother."""
+    if size < current_app.config['COMPRESSION_MIN_SIZE']:
+        return None
+    for encoding in ENCODINGS:
+        if request.accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+def precompressed(payload, encoding: str) -> bytes:
+    """Compressed body of a cached payload (anything with `.body`), computed once per encoding."""
+    with _variants_lock:
+        lock, variants = _variants.get(payload) or _variants.setdefault(payload, (threading.Lock(), {}))
+    # Requests that miss at the same time wait for one compression instead of repeating it
+    with lock:
+        body = variants.get(encoding)
+        if body is None:
+            body = variants[encoding] = compress(payload.body, encoding, best=True)
+    return body
+
+def _compressed_file(path: str, encoding: str) -> bytes:
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _files_lock:
+        cached = _files.get((path, encoding))
+        if cached and cached[0] == version:
+            return cached[1]
+        # A sibling compressed at build time (style.css.br, style.css.gz) wins if it is not older
+        sibling = path + SIBLING_SUFFIXES[encoding]
+        if os.path.isfile(sibling) and os.stat(sibling).st_mtime_ns >= stat.st_mtime_ns:
+            with open(sibling, 'rb') as f:
+                body = f.read()
+        else:
+            with open(path, 'rb') as f:
+                body = compress(f.read(), encoding, best=True)
+        _files[(path, encoding)] = (version, body)
+    return body
+
+def file_response(response: Response, path: str) -> Response:
+    """Swap a send_file response of a textual file for its precompressed body when the client accepts it."""
+    if response.status_code != 200 or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(os.path.getsize(path))
+    if not encoding:
+        return response
+    body = _compressed_file(path, encoding)
+    original = response.response
+    response.direct_passthrough = False
+    response.set_data(body)
+    if hasattr(original, 'close'):
+        original.close()
+    response.headers['Content-Encoding'] = encoding
+    response.headers.pop('Accept-Ranges', None)
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    # send_file compared If-None-Match with the uncompressed validator
+    return response.make_conditional(request)
+
+def payload_response(payload, mimetype: str, cache_control: str) -> Response:
+    """Serve a cached payload with `.body` and `.etag`, precompressed when the client accepts it."""
+    encoding = choose_encoding(len(payload.body))
+    if encoding:
+        response = Response(precompressed(payload, encoding), mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+        # Each representation needs its own validator
+        response.set_etag(f"{payload.etag}-{encoding}")
+    else:
+        response = Response(payload.body, mimetype=mimetype)
+        response.set_etag(payload.etag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+def compress_response(response: Response) -> Response:
+    """after_request hook: precompressed static files, other textual responses compressed on the fly."""
+    if response.direct_passthrough and request.endpoint == 'static' and 'Content-Encoding' not in response.headers:
+        path = safe_join(current_app.static_folder, request.view_args['filename'])
+        return file_response(response, path) if path and os.path.isfile(path) else response
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    encoding = choose_encoding(len(body))
+    if encoding:
+        # Never the best level here: this runs on every request
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
+
+def init_compression(app):
+    app.config.setdefault('COMPRESSION_MIN_SIZE', 1024)
+    app.after_request(compress_response)
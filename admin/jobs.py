@@ -0,0 +1,245 @@
+import datetime
+import os
+import socket
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select, update, or_
+from sqlalchemy.orm import Session
+
+from extensions import db
+from core.models import AdminJob, JobStatus
+
+# Background jobs for long admin operations (Excel import/export, import dry runs and rollbacks).
+# Job state lives in the admin_jobs table, so a page reload only has to poll it again;
+# the work itself runs in a small thread pool inside the admin process.
+
+PROGRESS_INTERVAL = 1.0  # seconds between progress writes of one job
+FINISHED = (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+SNAPSHOT_FILE = 'snapshot.zip'  # written by an import next to its job, kept for a rollback
+
+_executor = None
+_app = None
+# Tells this process apart from an earlier one that had the same pid
+_process_token = uuid.uuid4().hex[:12]
+
+class JobCancelled(Exception):
+    """Raised inside a running job once the admin has asked to cancel it."""
+
+def _now():
+    return datetime.datetime.utcnow()
+
+def job_path(job_id: int, name: str) -> str:
+    """Path of a job's input or result file inside ADMIN_JOB_DIR."""
+    return os.path.join(_app.config['ADMIN_JOB_DIR'], f"{job_id}-{name}")
+
+def _job_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{_process_token}"
+
+def _owner_alive(owner):
+    """True/False for an owner process on this host, None when it can't be checked from here."""
+    # Jobs from before owners were recorded belong to a process that has been replaced since
+    if not owner:
+        return False
+    host, pid, token = owner.rsplit(':', 2)
+    if host != socket.gethostname() or os.name != 'posix':
+        return None
+    if int(pid) == os.getpid():
+        return token == _process_token
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _fail_orphaned_jobs(session):
+    # Several admin processes (gunicorn workers, other hosts) share the table: only fail jobs whose
+    # owner is gone, or whose owner on another host has not reported for ADMIN_JOB_STALE_SECONDS
+    stale_before = _now() - datetime.timedelta(seconds=_app.config['ADMIN_JOB_STALE_SECONDS'])
+    unfinished = session.execute(
+        select(AdminJob).where(AdminJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]))
+    ).scalars().all()
+    for job in unfinished:
+        alive = _owner_alive(job.owner)
+        if alive is False or (alive is None and (job.updated_at or job.created_at) < stale_before):
+            job.status = JobStatus.FAILED
+            job.result = "Перервано перезапуском адмін-панелі"
+            job.finished_at = _now()
+
+def init_jobs(app):
+    """Start the worker pool, fail jobs orphaned by a stopped admin process and purge expired job files."""
+    global _executor, _app
+    _app = app
+    app.config.setdefault('ADMIN_JOB_DIR', 'instance/jobs')
+    app.config.setdefault('ADMIN_JOB_WORKERS', 2)
+    app.config.setdefault('ADMIN_JOB_RETENTION_DAYS', 7)
+    app.config.setdefault('ADMIN_JOB_STALE_SECONDS', 3600)
+    os.makedirs(app.config['ADMIN_JOB_DIR'], exist_ok=True)
+    _executor = ThreadPoolExecutor(max_workers=app.config['ADMIN_JOB_WORKERS'], thread_name_prefix='admin-job')
+
+    try:
+        with app.app_context(), Session(db.engine) as session:
+            _fail_orphaned_jobs(session)
+            _purge_old_jobs(session)
+            session.commit()
+    except Exception as e:
+        print(f"Error recovering admin jobs: {e}")
+
+def _update_job(job_id: int, **values):
+    # A separate short transaction: the job's own session may be in the middle of an import
+    with Session(db.engine) as session:
+        session.execute(update(AdminJob).where(AdminJob.id == job_id).values(updated_at=_now(), **values))
+        session.commit()
+
+class _JobProgress:
+    """progress(done, total) callback handed to a job: throttled DB writes plus the cancel check."""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.done = 0
+        self.total = None
+        self._last_write = time.monotonic()
+
+    def __call__(self, done, total):
+        self.done, self.total = done, total
+        now = time.monotonic()
+        if now - self._last_write < PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        with Session(db.engine) as session:
+            session.execute(
+                update(AdminJob).where(AdminJob.id == self.job_id)
+                .values(rows_done=done, rows_total=total, updated_at=_now())
+            )
+            cancel_requested = session.scalar(select(AdminJob.cancel_requested).where(AdminJob.id == self.job_id))
+            session.commit()
+        if cancel_requested:
+            raise JobCancelled()
+
+def _remove_file(path):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Error removing job file {path}: {e}")
+
+def _run(job_id: int, work):
+    with _app.app_context():
+        with Session(db.engine) as session:
+            job = session.get(AdminJob, job_id)
+            # Cancelled while still in the queue
+            if job is None or job.status != JobStatus.QUEUED:
+                return
+            job.status = JobStatus.RUNNING
+            job.started_at = job.updated_at = _now()
+            job.owner = _job_owner()
+            input_path = job.input_path
+            session.commit()
+
+        try:
+            # work(job_id, progress) -> (result text, result file path or None)
+            progress = _JobProgress(job_id)
+            result, result_path = work(job_id, progress)
+            snapshot_path = job_path(job_id, SNAPSHOT_FILE)
+            _update_job(
+                job_id, status=JobStatus.COMPLETED, rows_done=progress.done, rows_total=progress.total,
+                result=result, result_path=result_path, finished_at=_now(),
+                snapshot_path=snapshot_path if os.path.exists(snapshot_path) else None
+            )
+        except JobCancelled:
+            db.session.rollback()
+            _remove_file(job_path(job_id, SNAPSHOT_FILE))
+            _update_job(job_id, status=JobStatus.CANCELLED, result="Скасовано адміністратором", finished_at=_now())
+        except Exception as e:
+            db.session.rollback()
+            _remove_file(job_path(job_id, SNAPSHOT_FILE))
+            print(f"Error in admin job {job_id}: {e}")
+            traceback.print_exc()
+            # Validation errors come one per line
+            _update_job(
+                job_id, status=JobStatus.FAILED, result=str(e),
+                errors_count=len(str(e).splitlines()) or 1, finished_at=_now()
+            )
+        finally:
+            _remove_file(input_path)
+            db.session.remove()
+
+def _purge_old_jobs(session):
+    # Result files and import snapshots are kept for ADMIN_JOB_RETENTION_DAYS
+    cutoff = _now() - datetime.timedelta(days=_app.config['ADMIN_JOB_RETENTION_DAYS'])
+    old_jobs = session.execute(
+        select(AdminJob).where(
+            AdminJob.finished_at < cutoff,
+            or_(AdminJob.result_path.isnot(None), AdminJob.snapshot_path.isnot(None))
+        )
+    ).scalars().all()
+    for job in old_jobs:
+        _remove_file(job.result_path)
+        _remove_file(job.snapshot_path)
+        # Dry runs also leave an HTML report next to their XLSX
+        if job.kind == 'dry_run':
+            _remove_file(job_path(job.id, 'diff.html'))
+        job.result_path = job.snapshot_path = None
+
+def submit_job(kind: str, user_id, work, input_path=None) -> int:
+    """Queue `work(job_id, progress)` as a background job and return the job id."""
+    with Session(db.engine) as session:
+        _fail_orphaned_jobs(session)
+        _purge_old_jobs(session)
+        job = AdminJob(
+            kind=kind, status=JobStatus.QUEUED, user_id=user_id, input_path=input_path, owner=_job_owner()
+        )
+        session.add(job)
+        session.commit()
+        job_id = job.id
+    _executor.submit(_run, job_id, work)
+    return job_id
+
+def cancel_job(job_id: int):
+    """Cancel a queued job right away; a running one stops at its next progress report."""
+    with Session(db.engine) as session:
+        job = session.get(AdminJob, job_id)
+        if job is None or job.status in FINISHED:
+            return
+        if job.status == JobStatus.QUEUED:
+            job.status = JobStatus.CANCELLED
+            job.result = "Скасовано адміністратором"
+            job.finished_at = _now()
+        else:
+            job.cancel_requested = True
+        job.updated_at = _now()
+        session.commit()
+
+def discard_snapshot(job_id: int):
+    """Forget an import's snapshot once it has been restored, so it can't be applied twice."""
+    with Session(db.engine) as session:
+        job = session.get(AdminJob, job_id)
+        if job is None:
+            return
+        _remove_file(job.snapshot_path)
+        job.snapshot_path = None
+        session.commit()
+
+def job_progress(job: AdminJob) -> dict:
+    """JSON-ready state of a job, with an ETA estimated from the rows processed so far."""
+    eta = None
+    if job.status == JobStatus.RUNNING and job.started_at and job.rows_total and job.rows_done:
+        elapsed = (_now() - job.started_at).total_seconds()
+        eta = round(elapsed * (job.rows_total - job.rows_done) / job.rows_done)
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status.value,
+        'rows_done': job.rows_done or 0,
+        'rows_total': job.rows_total,
+        'errors_count': job.errors_count or 0,
+        'eta_seconds': eta,
+        'cancel_requested': bool(job.cancel_requested),
+        'result': job.result if job.status in FINISHED else None,
+        'downloadable': job.status == JobStatus.COMPLETED and bool(job.result_path or job.result),
+        'restorable': job.status == JobStatus.COMPLETED and bool(job.snapshot_path),
+    }
@@ -6,7 +6,7 @@ from datetime import datetime
 # Додаємо корінь проекту до шляхів
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from flask import Blueprint, redirect, url_for, flash, request, render_template, send_file, jsonify
+from flask import Blueprint, redirect, url_for, flash, request, render_template, send_file, jsonify, Response, current_app, abort
 import tempfile
 import os
 from flask_sqlalchemy import SQLAlchemy
@@ -17,7 +17,14 @@ from werkzeug.security import generate_password_hash, check_password_hash
 
 # Import the views and forms
 from admin.admin_views import LoginForm
-from core.models import User, Transaction, TransactionType, TransactionStatus, Farm, Category, Product, AvailabilityStatus, Region, Translation
+from core.models import User, Transaction, TransactionType, TransactionStatus, Farm, Category, Product, AvailabilityStatus, Region, Translation, AdminJob, JobStatus
+
+from core.utils.catalog import serialize_translations, serialize_regions, serialize_farms, serialize_categories, serialize_products, serialize_facets, serialize_product, normalize_product_fields, normalize_lang, FARM_TYPES, PRODUCT_FIELDS, PRODUCT_PAGE_SIZE, PRODUCT_LIST_FIELDS
+from core.utils.catalog_snapshot import catalog_snapshot, SnapshotEntry
+from admin.compression import payload_response, file_response
+from admin.jobs import submit_job, cancel_job, job_progress, job_path, discard_snapshot, SNAPSHOT_FILE
+from core.utils.images import ensure_derivative, source_path, is_safe_image_path, parse_media_filename, content_digest, image_url, VARIANTS, FORMATS
+from core.utils.catalog_search import catalog_search
 
 # Import shared db instance
 from extensions import db, admin
@@ -87,49 +94,54 @@ def admin_logout():
     logout_user()
     return redirect(url_for('admin_api.login'))
 
+def _product_list_query():
+    """The product list view's query (search, filters, sort from request.args) without a page limit."""
+    product_view = None
+    for view in admin._views:
+        if hasattr(view, 'model') and view.model == Product:
+            product_view = view
+            break
+    if product_view is None:
+        return None
+
+    # Get filter context from request.args
+    v_args = product_view._get_list_extra_args()
+    # Map the sort column index to its name, as the list view does
+    sort_column = product_view._get_column_by_idx(v_args.sort)
+    _, query = product_view.get_list(
+        page=None,
+        sort_column=sort_column[0] if sort_column else None,
+        sort_desc=v_args.sort_desc,
+        search=v_args.search,
+        filters=v_args.filters,
+        execute=False,
+        page_size=0
+    )
+    return query.statement
+
 @admin_api.route('/admin/export_products')
 @login_required
 def export_products():
     if not current_user.is_admin:
         flash('Access denied')
         return redirect(url_for('admin.index'))
-    import tempfile
-    import os
     from core.utils.excel_manager import export_products_to_excel_sync
 
-    # Find the ProductView instance
-    product_view = None
-    for view in admin._views:
-        if hasattr(view, 'model') and view.model == Product:
-            product_view = view
-            break
-
-    if product_view:
-        # Get filter context from request.args
-        v_args = product_view._get_list_extra_args()
-        # Use official get_list method with large page_size to get all results
-        count, products = product_view.get_list(
-            page=0,
-            sort_column=v_args.sort,
-            sort_desc=v_args.sort_desc,
-            search=v_args.search,
-            filters=v_args.filters,
-            page_size=10000  # Large number to get all matching records
-        )
-    else:
-        products = None
+    # Built now, while the list view's request args are available; executed by the job
+    query = _product_list_query()
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
+    def work(job_id, progress):
+        path = job_path(job_id, 'products.xlsx')
         try:
-            export_products_to_excel_sync(db.session, tmp.name, products=products)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-            filename = f"products_{timestamp}.xlsx"
-            return send_file(tmp.name, as_attachment=True, download_name=filename)
-        except Exception as e:
-            print(f"Export error: {str(e)}")
-            traceback.print_exc()
-            flash(f'Помилка експорту: {str(e)}')
-            return redirect(url_for('product.index_view'))
+            result = export_products_to_excel_sync(db.session, path, query=query, progress=progress)
+        except Exception:
+            if os.path.exists(path):
+                os.unlink(path)
+            raise
+        return result, path
+
+    job_id = submit_job('export', current_user.id, work)
+    return redirect(url_for('admin_api.job_status', job_id=job_id))
 
 @admin_api.route('/admin/import_products', methods=['GET', 'POST'])
 @login_required
@@ -140,21 +152,152 @@ def import_products():
     if request.method == 'POST':
         file = request.files.get('file')
         if file and file.filename.endswith('.xlsx'):
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-                file.save(tmp.name)
-                try:
-                    from core.utils.excel_manager import import_products_from_excel_sync
-                    result = import_products_from_excel_sync(db.session, tmp.name)
-                    flash(f'Імпорт завершено: {result}')
-                except Exception as e:
-                    flash(f'Помилка імпорту: {str(e)}')
-                finally:
-                    os.unlink(tmp.name)
-        else:
-            flash('Будь ласка, виберіть файл .xlsx')
+            from core.utils.excel_manager import import_products_from_excel_sync, diff_products_sheet, write_diff_report_xlsx, format_diff_summary
+            # The upload is kept next to the job until it has run (the job deletes it)
+            fd, input_path = tempfile.mkstemp(suffix='.xlsx', dir=current_app.config['ADMIN_JOB_DIR'])
+            os.close(fd)
+            file.save(input_path)
+
+            def work(job_id, progress):
+                # The snapshot lets this exact import be rolled back from its job page
+                result = import_products_from_excel_sync(
+                    db.session, input_path, progress=progress, snapshot_path=job_path(job_id, SNAPSHOT_FILE)
+                )
+                catalog_snapshot.invalidate_for_model(Product)
+                return result, None
+
+            # Dry run: the same parsing and matching, a diff report instead of writes
+            def dry_run(job_id, progress):
+                diff = diff_products_sheet(db.session, input_path, progress=progress)
+                path = job_path(job_id, 'diff.xlsx')
+                write_diff_report_xlsx(diff, path)
+                with open(job_path(job_id, 'diff.html'), 'w', encoding='utf-8') as f:
+                    f.write(render_template('admin/import_diff.html', diff=diff, job_id=job_id, limit=DIFF_REPORT_ROWS))
+                return format_diff_summary(diff['summary']), path
+
+            if request.form.get('dry_run'):
+                job_id = submit_job('dry_run', current_user.id, dry_run, input_path=input_path)
+            else:
+                job_id = submit_job('import', current_user.id, work, input_path=input_path)
+            return redirect(url_for('admin_api.job_status', job_id=job_id))
+        flash('Будь ласка, виберіть файл .xlsx')
         return redirect(url_for('product.index_view'))
     return render_template('admin/import_products.html')
 
+# Rows per table in the HTML dry-run report; the XLSX report has all of them
+DIFF_REPORT_ROWS = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def _get_job_or_404(job_id):
+    job = db.session.get(AdminJob, job_id)
+    if job is None:
+        abort(404)
+    return job
+
+@admin_api.route('/admin/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    if not current_user.is_admin:
+        flash('Access denied')
+        return redirect(url_for('admin.index'))
+    from core.utils.excel_manager import snapshots_supported
+    return render_template('admin/job.html', job=_get_job_or_404(job_id), restore_supported=snapshots_supported(db.engine))
+
+@admin_api.route('/admin/jobs/<int:job_id>/progress')
+@login_required
+def job_progress_api(job_id):
+    if not current_user.is_admin:
+        return jsonify({"error": "Access denied"}), 403
+    return jsonify(job_progress(_get_job_or_404(job_id)))
+
+@admin_api.route('/admin/jobs/<int:job_id>/cancel', methods=['POST'])
+@login_required
+def job_cancel(job_id):
+    if not current_user.is_admin:
+        return jsonify({"error": "Access denied"}), 403
+    _get_job_or_404(job_id)
+    cancel_job(job_id)
+    db.session.expire_all()
+    return jsonify(job_progress(_get_job_or_404(job_id)))
+
+@admin_api.route('/admin/jobs/<int:job_id>/download')
+@login_required
+def job_download(job_id):
+    if not current_user.is_admin:
+        flash('Access denied')
+        return redirect(url_for('admin.index'))
+    job = _get_job_or_404(job_id)
+    if job.status != JobStatus.COMPLETED:
+        abort(404)
+    timestamp = (job.finished_at or datetime.now()).strftime("%Y%m%d_%H%M")
+    if job.result_path:
+        if not os.path.isfile(job.result_path):
+            abort(404)
+        name = f"import_diff_{job.id}_{timestamp}.xlsx" if job.kind == 'dry_run' else f"products_{timestamp}.xlsx"
+        path = job.result_path
+
+        # Streamed in fixed chunks; the file itself stays for ADMIN_JOB_RETENTION_DAYS
+        def stream():
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(EXPORT_CHUNK_SIZE), b''):
+                    yield chunk
+
+        response = Response(stream(), mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        response.headers['Content-Disposition'] = f'attachment; filename="{name}"'
+        response.headers['Content-Length'] = str(os.path.getsize(path))
+        return response
+    # Imports have no file: their report is the result
+    response = Response(job.result or '', mimetype='text/plain')
+    response.headers['Content-Disposition'] = f'attachment; filename="import_{job.id}_{timestamp}.txt"'
+    return response
+
+@admin_api.route('/admin/jobs/<int:job_id>/restore', methods=['POST'])
+@login_required
+def job_restore(job_id):
+    if not current_user.is_admin:
+        flash('Access denied')
+        return redirect(url_for('admin.index'))
+    job = _get_job_or_404(job_id)
+    from core.utils.excel_manager import restore_products_snapshot, snapshots_supported
+    if not snapshots_supported(db.engine):
+        flash('Відкат імпорту працює лише з PostgreSQL')
+        return redirect(url_for('admin_api.job_status', job_id=job_id))
+    if job.status != JobStatus.COMPLETED or not job.snapshot_path or not os.path.isfile(job.snapshot_path):
+        flash('Для цього імпорту немає знімка для відкату')
+        return redirect(url_for('admin_api.job_status', job_id=job_id))
+    # Only the latest import can be undone: a later one, even if already restored or purged,
+    # may have written the same products and would be silently overwritten
+    later = db.session.scalars(
+        select(AdminJob.id).where(
+            AdminJob.id > job.id, AdminJob.kind == 'import', AdminJob.status == JobStatus.COMPLETED
+        ).order_by(AdminJob.id)
+    ).all()
+    if later:
+        flash(f"Після цього імпорту вже були інші ({', '.join(f'#{later_id}' for later_id in later)}), відкат неможливий")
+        return redirect(url_for('admin_api.job_status', job_id=job_id))
+    snapshot_path = job.snapshot_path
+
+    def work(restore_job_id, progress):
+        result = restore_products_snapshot(db.session, snapshot_path, progress=progress)
+        catalog_snapshot.invalidate_for_model(Product)
+        discard_snapshot(job_id)
+        return f"Import #{job_id}: {result}", None
+
+    restore_job_id = submit_job('restore', current_user.id, work)
+    return redirect(url_for('admin_api.job_status', job_id=restore_job_id))
+
+@admin_api.route('/admin/jobs/<int:job_id>/report')
+@login_required
+def job_report(job_id):
+    if not current_user.is_admin:
+        flash('Access denied')
+        return redirect(url_for('admin.index'))
+    job = _get_job_or_404(job_id)
+    path = job_path(job.id, 'diff.html')
+    if job.kind != 'dry_run' or job.status != JobStatus.COMPLETED or not os.path.isfile(path):
+        abort(404)
+    return send_file(os.path.abspath(path), mimetype='text/html')
+
 @admin_api.route('/webhook/paypal/simulate', methods=['POST'])
 def paypal_simulate():
     data = request.get_json()
@@ -187,144 +330,182 @@ def paypal_simulate():
 
         return jsonify({"success": True, "new_balance": user.balance})
 
+# The WebApp shell has no per-request context: render it once and serve the cached bytes
+_webapp_shell = None
+_webapp_hero_url = None
+
 @admin_api.route('/webapp')
 def webapp():
     """Serve the WebApp interface."""
-    return render_template('webapp/index.html')
+    global _webapp_shell, _webapp_hero_url
+    # The header image URL carries the upload's content hash: re-render when it changes
+    hero_image_url = image_url('hero.jpg', 'hero')
+    if _webapp_shell is None or current_app.debug or hero_image_url != _webapp_hero_url:
+        _webapp_shell = SnapshotEntry(render_template(
+            'webapp/index.html', hero_image_url=hero_image_url,
+            product_page_size=PRODUCT_PAGE_SIZE, product_list_fields=','.join(PRODUCT_LIST_FIELDS)
+        ).encode('utf-8'))
+        _webapp_hero_url = hero_image_url
+    # Revalidated on every open (cheap 304), so a deploy shows up immediately
+    return payload_response(_webapp_shell, 'text/html', 'no-cache')
+
+@admin_api.route('/media/<variant>/<path:filename>')
+def media(variant, filename):
+    """Serve a resized image derivative, generating it on first request."""
+    image_path, digest, fmt = parse_media_filename(filename)
+    if variant not in VARIANTS or fmt not in FORMATS or not is_safe_image_path(image_path):
+        abort(404)
+    path = ensure_derivative(image_path, variant, fmt)
+    if path is None:
+        # No Pillow or an unreadable image: fall back to the original upload
+        path = source_path(image_path)
+        if not os.path.isfile(path):
+            abort(404)
+    response = send_file(os.path.abspath(path), conditional=True)
+    # A content-hashed URL never changes its bytes; an old hash or a bare URL gets the short policy
+    if digest is not None and digest == content_digest(image_path):
+        response.headers['Cache-Control'] = current_app.config['MEDIA_HASHED_CACHE_CONTROL']
+    else:
+        response.headers['Cache-Control'] = current_app.config['MEDIA_CACHE_CONTROL']
+    # Only an SVG original fallback is textual; raster images go out as they are
+    return file_response(response, path)
 
 # WebApp API Endpoints
+# Read endpoints serve precomputed JSON bytes from the catalog snapshot;
+# admin edits and Excel imports invalidate the affected sections.
+def _snapshot_response(section, params, build, cache=True):
+    return _entry_response(catalog_snapshot.get(section, params, build, cache=cache))
+
+def _snapshot_response_composed(section, params, parts):
+    return _entry_response(catalog_snapshot.compose(section, params, parts))
+
+def _entry_response(entry):
+    # Strong ETag from the snapshot payload: repeat opens get 304 Not Modified without a body;
+    # the body itself is compressed once per encoding and reused until the entry is invalidated
+    return payload_response(entry, 'application/json', current_app.config['WEBAPP_API_CACHE_CONTROL'])
+
+def _build_with_session(serializer, **kwargs):
+    def build():
+        with db.session() as session:
+            return serializer(session, **kwargs)
+    return build
+
 @admin_api.route('/api/ui/translations')
 def api_ui_translations():
     """Return all UI translations for the WebApp."""
-    lang = request.args.get('lang', 'uk')
-    with db.session() as session:
-        translations = session.execute(select(Translation)).scalars().all()
-        translations_dict = {}
-        for trans in translations:
-            if lang == 'de' and trans.value_de:
-                translations_dict[trans.key] = trans.value_de
-            else:
-                translations_dict[trans.key] = trans.value_uk or trans.key
-        return jsonify(translations_dict)
+    lang = normalize_lang(request.args.get('lang'))
+    return _snapshot_response('translations', {'lang': lang}, _build_with_session(serialize_translations, lang=lang))
+
+@admin_api.route('/api/webapp/bootstrap')
+def api_webapp_bootstrap():
+    """Return everything the WebApp needs for its first screen in one response."""
+    lang = normalize_lang(request.args.get('lang'))
+    # Stitched from the same cached payloads the individual endpoints serve
+    return _snapshot_response_composed('bootstrap', {'lang': lang}, {
+        'translations': ('translations', {'lang': lang}, _build_with_session(serialize_translations, lang=lang)),
+        'regions': ('regions', {}, _build_with_session(serialize_regions)),
+        'farms': ('farms', {}, _build_with_session(serialize_farms)),
+        'categories': ('categories', {}, _build_with_session(serialize_categories)),
+        'facets': ('facets', {}, _build_with_session(serialize_facets)),
+    })
 
 @admin_api.route('/api/catalog/regions')
 def api_regions():
     """Return list of regions for the WebApp."""
-    with db.session() as session:
-        regions = session.execute(select(Region).order_by(Region.id)).scalars().all()
-        regions_data = []
-        for region in regions:
-            regions_data.append({
-                'id': region.id,
-                'name': region.name,
-                'name_de': region.name_de,
-                'slug': region.slug
-            })
-        return jsonify(regions_data)
+    return _snapshot_response('regions', {}, _build_with_session(serialize_regions))
 
 @admin_api.route('/api/catalog/farms')
 def api_farms():
     """Return list of active farms for the WebApp, optionally filtered by region_id and farm_type."""
     region_id = request.args.get('region_id', type=int)
     farm_type = request.args.get('farm_type', type=str)
+    farm_type = farm_type.lower() if farm_type else None
 
-    with db.session() as session:
-        query = select(Farm).where(Farm.is_active == True)
-
-        if region_id:
-            query = query.where(Farm.region_id == region_id)
-        if farm_type:
-            # Case-insensitive comparison
-            query = query.where(db.func.lower(Farm.farm_type) == farm_type.lower())
-
-        # Sort by id ASC
-        query = query.order_by(Farm.id)
-
-        farms = session.execute(query).scalars().all()
-        farms_data = []
-        for farm in farms:
-            farms_data.append({
-                'id': farm.id,
-                'name': farm.name,
-                'description_uk': farm.description_uk,
-                'description_de': farm.description_de,
-                'location': farm.location,
-                'contact_info': farm.contact_info,
-                'image_path': farm.image_path,
-                'region_id': farm.region_id,
-                'region_name': farm.region.name if farm.region else None,
-                'farm_type': farm.farm_type
-            })
-        return jsonify(farms_data)
+    # Only the WebApp's own farm types are kept in the snapshot; anything else is a one-off query
+    return _snapshot_response(
+        'farms',
+        {'region_id': region_id, 'farm_type': farm_type},
+        _build_with_session(serialize_farms, region_id=region_id, farm_type=farm_type),
+        cache=farm_type is None or farm_type in FARM_TYPES
+    )
 
 @admin_api.route('/api/catalog/categories')
 def api_categories():
     """Return list of categories for the WebApp, optionally filtered by farm_id."""
     farm_id = request.args.get('farm_id', type=int)
-
-    with db.session() as session:
-        query = select(Category)
-
-        if farm_id:
-            # Filter categories that have products for this farm
-            query = query.join(Category.products).where(Product.farm_id == farm_id).distinct()
-
-        # Sort by id ASC
-        query = query.order_by(Category.id)
-
-        categories = session.execute(query).scalars().all()
-        categories_data = []
-        for category in categories:
-            categories_data.append({
-                'id': category.id,
-                'name': category.name,
-                'name_de': category.name_de,
-                'slug': category.slug,
-                'description': category.description,
-                'description_de': category.description_de,
-                'image_path': category.image_path
-            })
-        return jsonify(categories_data)
+    return _snapshot_response('categories', {'farm_id': farm_id}, _build_with_session(serialize_categories, farm_id=farm_id))
 
 @admin_api.route('/api/catalog/products')
 def api_products():
-    """Return products for the WebApp, optionally filtered by category_id or farm_id."""
+    """Return products for the WebApp, optionally filtered by category_id or farm_id.
+
+    `after_id` + `limit` page through the list by id, `fields=id,name,price` trims each item.
+    """
     category_id = request.args.get('category_id', type=int)
     farm_id = request.args.get('farm_id', type=int)
+    after_id = request.args.get('after_id', type=int)
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, current_app.config['WEBAPP_API_MAX_PAGE_SIZE']))
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    try:
+        fields = normalize_product_fields(fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Fixed number of queries regardless of catalog size (no lazy loads per product).
+    # Only first pages in the shapes the WebApp asks for are snapshotted: later keyset pages
+    # and custom projections are built per request instead of piling up one entry per cursor.
+    cache = after_id is None and limit in (None, PRODUCT_PAGE_SIZE) and fields in (PRODUCT_FIELDS, PRODUCT_LIST_FIELDS)
+    return _snapshot_response(
+        'products',
+        {
+            'category_id': category_id, 'farm_id': farm_id, 'after_id': after_id, 'limit': limit,
+            'fields': ','.join(fields)
+        },
+        _build_with_session(
+            serialize_products, category_id=category_id, farm_id=farm_id,
+            after_id=after_id, limit=limit, fields=fields
+        ),
+        cache=cache
+    )
+
+@admin_api.route('/api/catalog/facets')
+def api_facets():
+    """Return in-stock product counts per region, farm, farm type and category for the WebApp filters."""
+    return _snapshot_response('facets', {}, _build_with_session(serialize_facets))
+
+@admin_api.route('/api/catalog/search')
+def api_search():
+    """Search in-stock products by name, description, SKU, farm and category (prefix match)."""
+    query = request.args.get('q', '').strip()
+    lang = request.args.get('lang', 'uk')
+    limit = request.args.get('limit', 20, type=int)
+    limit = max(1, min(limit, current_app.config['WEBAPP_API_MAX_PAGE_SIZE']))
+    if not query:
+        return jsonify([])
+
+    app = current_app._get_current_object()
+
+    def load(index, generation):
+        # Also runs in the index's background rebuild thread
+        with app.app_context():
+            with db.session() as session:
+                index.load(session, generation)
+
+    # Rebuilt (in the background) only after bulk changes; single product edits update the index in place
+    catalog_search.ensure_current(catalog_snapshot.generation('products'), load)
+    return jsonify(catalog_search.search(query, lang=lang, limit=limit))
+
+@admin_api.route('/api/catalog/products/<int:product_id>')
+def api_product_detail(product_id):
+    """Return full detail of one product for the WebApp."""
+    def build():
+        with db.session() as session:
+            product = serialize_product(session, product_id)
+        if product is None:
+            # Raised inside the build, so a missing product is never cached
+            abort(404)
+        return product
 
-    with db.session() as session:
-        query = select(Product).where(Product.availability_status == AvailabilityStatus.IN_STOCK)
-
-        if category_id:
-            # Join with categories for filtering
-            query = query.join(Product.categories).where(Category.id == category_id)
-
-        if farm_id:
-            # Filter by farm
-            query = query.where(Product.farm_id == farm_id)
-
-        # Sort by id ASC
-        query = query.order_by(Product.id)
-        products = session.execute(query).scalars().all()
-        products_data = []
-        for product in products:
-            # Get category names
-            category_names = [cat.name for cat in product.categories]
-            category_names_de = [cat.name_de for cat in product.categories] if product.categories else []
-
-            products_data.append({
-                'id': product.id,
-                'name': product.name,
-                'name_de': product.name_de,
-                'price': product.price,
-                'unit': product.unit,
-                'sku': product.sku,
-                'description': product.description,
-                'description_de': product.description_de,
-                'categories': category_names,
-                'categories_de': category_names_de,
-                'farm_name': product.farm.name if product.farm else None,
-                'farm_name_de': product.farm.name if product.farm else None,  # Assuming farm names are the same
-                'image_path': product.image_path
-            })
-        return jsonify(products_data)
\ No newline at end of file
+    return _snapshot_response('products', {'product_id': product_id}, build)
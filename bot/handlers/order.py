@@ -8,20 +8,16 @@ from core.models import Order, OrderItem, OrderStatus, User, Translation
 router = Router()
 
 @router.message(F.web_app_data)
-async def handle_webapp_data(message: Message):
+async def handle_webapp_data(message: Message, db_user: User = None):
     """Handle order data from WebApp checkout."""
     try:
         # Parse the WebApp data
         order_data = json.loads(message.web_app_data.data)
 
-        user_id = message.from_user.id
+        # User comes from the per-update user context
+        user = db_user
 
         async with async_session() as session:
-            # Get user
-            user = await session.scalar(
-                select(User).where(User.tg_id == user_id)
-            )
-
             if not user:
                 await message.reply("❌ User not found. Please restart the bot.")
                 return
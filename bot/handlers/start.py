@@ -10,7 +10,8 @@ from sqlalchemy import select
 from core.database import async_session
 from core.models import User, StaticPage, Translation
 from bot.keyboards.main_menu import get_main_menu_keyboard
-from bot.utils import TranslationFilter, get_translation
+from bot.utils import TranslationFilter, get_translation, get_translations
+from bot.middlewares.user_context import user_cache
 
 router = Router()
 
@@ -23,40 +24,38 @@ class OnboardingStates(StatesGroup):
     waiting_for_phone = State()
 
 @router.message(Command("start"))
-async def start_handler(message: Message, state: FSMContext):
+async def start_handler(message: Message, state: FSMContext, db_user: User = None):
     tg_id = message.from_user.id
     full_name = message.from_user.full_name
 
     try:
-        async with async_session() as session:
-            user = await session.scalar(select(User).where(User.tg_id == tg_id))
-
-            # If user exists and has completed onboarding (has phone), show main menu
-            if user and user.phone:
-                # IMMEDIATELY use the database language preference
-                current_lang = user.language_pref.value if user.language_pref else "uk"
-                main_menu = await get_main_menu_keyboard(current_lang)
-                welcome_text = await get_translation("welcome_message", current_lang)
-                choose_hint = await get_translation("choose_section_hint", current_lang)
-                await message.answer(f"{welcome_text} {choose_hint}", reply_markup=main_menu)
-                return
-
-            # Start onboarding flow for new users or incomplete profiles
-            await state.update_data(tg_id=tg_id, full_name=full_name)
+        user = db_user
 
-            # Language selection
-            builder = InlineKeyboardBuilder()
-            builder.button(text="🇺🇦 Українська", callback_data="lang_uk")
-            builder.button(text="🇩🇪 Deutsch", callback_data="lang_de")
-
-            await message.answer(
-                "🌍 <b>Виберіть мову / Choose language:</b>\n\n"
-                "🇺🇦 Українська\n"
-                "🇩🇪 Deutsch",
-                reply_markup=builder.as_markup(),
-                parse_mode="HTML"
-            )
-            await state.set_state(OnboardingStates.waiting_for_language)
+        # If user exists and has completed onboarding (has phone), show main menu
+        if user and user.phone:
+            # IMMEDIATELY use the database language preference
+            current_lang = user.language_pref.value if user.language_pref else "uk"
+            main_menu = await get_main_menu_keyboard(current_lang)
+            labels = await get_translations(["welcome_message", "choose_section_hint"], current_lang)
+            await message.answer(f"{labels['welcome_message']} {labels['choose_section_hint']}", reply_markup=main_menu)
+            return
+
+        # Start onboarding flow for new users or incomplete profiles
+        await state.update_data(tg_id=tg_id, full_name=full_name)
+
+        # Language selection
+        builder = InlineKeyboardBuilder()
+        builder.button(text="🇺🇦 Українська", callback_data="lang_uk")
+        builder.button(text="🇩🇪 Deutsch", callback_data="lang_de")
+
+        await message.answer(
+            "🌍 <b>Виберіть мову / Choose language:</b>\n\n"
+            "🇺🇦 Українська\n"
+            "🇩🇪 Deutsch",
+            reply_markup=builder.as_markup(),
+            parse_mode="HTML"
+        )
+        await state.set_state(OnboardingStates.waiting_for_language)
 
     except Exception as e:
         await message.answer("Сталася помилка при реєстрації. Спробуйте ще раз.")
@@ -84,6 +83,7 @@ async def process_language(callback: CallbackQuery, state: FSMContext):
             # Save language preference immediately
             user.language_pref = language
             await session.commit()
+        user_cache.invalidate(data["tg_id"])
     except Exception as e:
         # Continue with onboarding even if DB save fails
         pass
@@ -272,6 +272,7 @@ async def finalize_onboarding(message: Message, state: FSMContext, phone: str):
             user.phone = phone
 
             await session.commit()
+        user_cache.invalidate(data["tg_id"])
 
         # Clear state
         await state.clear()
@@ -301,11 +302,11 @@ async def finalize_onboarding(message: Message, state: FSMContext, phone: str):
 
 # Impressum handler
 @router.message(TranslationFilter("impressum_button"))
-async def handle_impressum_message(message: Message):
+async def handle_impressum_message(message: Message, db_user: User = None):
     """Handle impressum button clicks in both languages."""
-    await impressum_handler(message)
+    await impressum_handler(message, db_user)
 
-async def impressum_handler(message: Message):
+async def impressum_handler(message: Message, user: User = None):
     try:
         async with async_session() as session:
             # Get impressum from StaticPage table
@@ -314,8 +315,7 @@ async def impressum_handler(message: Message):
             )
 
             if impressum_page:
-                # Get user language preference
-                user = await session.scalar(select(User).where(User.tg_id == message.from_user.id))
+                # User language preference comes from the per-update user context
                 language = user.language_pref if user else "uk"
 
                 if language == "uk":
@@ -344,7 +344,8 @@ async def profile_handler(message: Message, user_id: int = None):
     """Show user profile with balance, name, phone and language toggle."""
     try:
         async with async_session() as session:
-            # Use provided user_id or fallback to message sender
+            # Use provided user_id or fallback to message sender.
+            # Always read the fresh row here: the profile shows the current balance
             target_user_id = user_id or message.from_user.id
             user = await session.scalar(select(User).where(User.tg_id == target_user_id))
 
@@ -355,20 +356,20 @@ async def profile_handler(message: Message, user_id: int = None):
             # Get localized labels
             user_language = user.language_pref.value if user.language_pref else "uk"
 
-            name_label = await get_translation("name_label", user_language)
-            phone_label = await get_translation("phone_label", user_language)
-            balance_label = await get_translation("balance_label", user_language)
-            change_lang_btn = await get_translation("change_lang_btn", user_language)
+            labels = await get_translations(
+                ["profile_title", "name_label", "phone_label", "balance_label", "change_lang_btn"],
+                user_language
+            )
 
             # Format profile message
-            profile_text = f"👤 <b>{await get_translation('profile_title', user_language)}</b>\n\n"
-            profile_text += f"{name_label}: {user.full_name or 'Не вказано'}\n"
-            profile_text += f"{phone_label}: {user.phone or 'Не вказано'}\n"
-            profile_text += f"{balance_label}: {user.balance:.2f} €\n"
+            profile_text = f"👤 <b>{labels['profile_title']}</b>\n\n"
+            profile_text += f"{labels['name_label']}: {user.full_name or 'Не вказано'}\n"
+            profile_text += f"{labels['phone_label']}: {user.phone or 'Не вказано'}\n"
+            profile_text += f"{labels['balance_label']}: {user.balance:.2f} €\n"
 
             # Create inline keyboard with language toggle
             builder = InlineKeyboardBuilder()
-            builder.button(text=change_lang_btn, callback_data="toggle_language")
+            builder.button(text=labels["change_lang_btn"], callback_data="toggle_language")
 
             await message.answer(
                 profile_text,
@@ -398,6 +399,7 @@ async def toggle_language(callback: CallbackQuery):
             user.language_pref = new_language
 
             await session.commit()
+            user_cache.invalidate(callback.from_user.id)
 
             # Get confirmation message in new language
             if new_language == "de":
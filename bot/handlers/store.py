@@ -1,12 +1,16 @@
-import sqlalchemy
 from aiogram import Router, F, types
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, FSInputFile
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy import select
 from sqlalchemy.orm import joinedload
 from core.database import async_session
 from core.models import Category, Product, CartItem, User, Translation, AvailabilityStatus
 from bot.utils import TranslationFilter, get_translation
+from bot.services.image_cache import image_cache
+from bot.services.sender import bulk_sends
+from bot.services.cart import CartTapCoalescer
+from bot.services.catalog import CATALOG_BROWSE_MODE, CATALOG_PAGE_SIZE, category_index, get_page_bounds
 from datetime import datetime
 import os
 
@@ -44,6 +48,53 @@ def is_order_allowed():
         return False
     return True
 
+# Helper function to load the user's cart as product_id -> quantity in one query
+async def load_cart_quantities(session, user_id: int) -> dict:
+    rows = await session.execute(
+        select(CartItem.product_id, CartItem.quantity).where(CartItem.user_id == user_id)
+    )
+    return {product_id: quantity for product_id, quantity in rows}
+
+# Helper function to build product card caption and keyboard without touching the database
+def build_product_card(product: Product, current_quantity: float, cart_count: int, user_language: str, price_label: str):
+    """Build (caption, reply_markup) for a product card from preloaded data."""
+    product_name = get_localized_product_name(product, user_language)
+    product_description = get_localized_product_description(product, user_language)
+
+    # Translate unit for German users
+    unit_display = "kg" if user_language == "de" and product.unit == "кг" else product.unit
+
+    caption = f"<b>{product_name}</b>\n\n"
+    if product_description:
+        caption += f"{product_description}\n\n"
+    caption += f"💶 {price_label}: {product.price} €/{unit_display}"
+
+    # Create inline keyboard for quantity control
+    builder = InlineKeyboardBuilder()
+    cart_text = f"В кошику: {current_quantity}" if user_language == "uk" else f"Im Warenkorb: {current_quantity}"
+
+    if is_order_allowed():
+        builder.button(text="-", callback_data=f"decrease_{product.id}")
+        builder.button(text=cart_text, callback_data="qty")
+        builder.button(text="+", callback_data=f"increase_{product.id}")
+    else:
+        builder.button(text="-", callback_data="disabled")
+        builder.button(text=cart_text, callback_data="qty")
+        builder.button(text="+", callback_data="disabled")
+
+    builder.adjust(3)
+
+    # Add navigation buttons
+    builder.row()
+    back_text = "⬅️ Назад до категорій" if user_language == "uk" else "⬅️ Zurück zu Kategorien"
+    builder.button(text=back_text, callback_data="back_to_categories")
+
+    if cart_count > 0:
+        cart_btn_text = "🛒 Перейти до кошика" if user_language == "uk" else "🛒 Zum Warenkorb"
+        builder.button(text=cart_btn_text, callback_data="go_to_cart")
+
+    return caption, builder.as_markup()
+
 # Category selection handler
 
 def get_categories_keyboard():
@@ -53,13 +104,12 @@ def get_categories_keyboard():
     return builder.as_markup()
 
 @router.message(TranslationFilter("catalog_button"))
-async def show_categories(message: Message):
+async def show_categories(message: Message, db_user: User = None):
     """Handle catalog button clicks in both languages and show category selection."""
     try:
         async with async_session() as session:
-            # Get user language preference
-            user = await session.scalar(select(User).where(User.tg_id == message.from_user.id))
-            user_language = user.language_pref.value if user and user.language_pref else "uk"
+            # User language preference comes from the per-update user context
+            user_language = db_user.language_pref.value if db_user and db_user.language_pref else "uk"
 
             # Get all categories
             categories = await session.scalars(select(Category))
@@ -93,13 +143,18 @@ async def show_categories(message: Message):
 
 # Category callback handler
 @router.callback_query(F.data.startswith("category_"))
-async def show_category_products(callback: CallbackQuery):
+async def show_category_products(callback: CallbackQuery, db_user: User = None):
+    answered = False
     try:
         category_id = int(callback.data.split("_")[1])
 
+        # Paginated mode: one message per page, edited in place
+        if CATALOG_BROWSE_MODE == "pages":
+            await show_category_page(callback, category_id, 0, db_user)
+            return
+
+        user = db_user
         async with async_session() as session:
-            # Get user language preference
-            user = await session.scalar(select(User).where(User.tg_id == callback.from_user.id))
             user_language = user.language_pref.value if user and user.language_pref else "uk"
 
             # Get category and its products
@@ -123,191 +178,230 @@ async def show_category_products(callback: CallbackQuery):
                 await callback.answer(error_msg)
                 return
 
-            # Send products as cards
+            # Load the whole cart once as product_id -> quantity
+            cart_quantities = await load_cart_quantities(session, user.id) if user else {}
+            cart_count = len(cart_quantities)
+            price_label = await get_translation("price_label", user_language)
+
+            # Build every card in memory before sending anything
+            cards = []
             for product in products:
                 try:
-                    # Build product card caption with localized content
-                    product_name = get_localized_product_name(product, user_language)
-                    product_description = get_localized_product_description(product, user_language)
+                    caption, markup = build_product_card(
+                        product,
+                        cart_quantities.get(product.id, 0),
+                        cart_count,
+                        user_language,
+                        price_label
+                    )
+                    cards.append((product, caption, markup))
+                except Exception as product_error:
+                    print(f"Error displaying product {product.id}: {product_error}")
+                    # Continue with next product instead of failing completely
+                    continue
 
-                    # Get localized price label
-                    price_label = await get_translation("price_label", user_language)
+        # Answer before the cards: throttled sends can outlast the callback query's lifetime
+        await callback.answer()
+        answered = True
 
-                    # Translate unit for German users
-                    unit_display = "kg" if user_language == "de" and product.unit == "кг" else product.unit
+        # Send product cards as low-priority bulk sends so interactive replies go first
+        with bulk_sends():
+            for product, caption, markup in cards:
+                await send_product_card(callback.message, product, caption, markup)
+    except Exception as e:
+        print(f"Error in show_category_products: {e}")
+        if not answered:
+            await callback.answer("Сталася помилка при завантаженні товарів.")
 
-                    caption = f"<b>{product_name}</b>\n\n"
-                    if product_description:
-                        caption += f"{product_description}\n\n"
-                    caption += f"💶 {price_label}: {product.price} €/{unit_display}"
+# Helper function to send a single product card, reusing cached Telegram file_ids
+async def send_product_card(message: Message, product: Product, caption: str, markup: InlineKeyboardMarkup):
+    try:
+        # Reuse the Telegram file_id when the image was already uploaded
+        photo = await image_cache.get_photo(product.image_path)
+        if photo:
+            sent = await message.answer_photo(
+                photo=photo,
+                caption=caption,
+                reply_markup=markup,
+                parse_mode="HTML"
+            )
+            if isinstance(photo, FSInputFile):
+                await image_cache.remember(product.image_path, sent)
+        else:
+            # Send text-only message if no image
+            await message.answer(
+                caption,
+                reply_markup=markup,
+                parse_mode="HTML"
+            )
+    except Exception as image_error:
+        # If image sending fails, send text-only as fallback
+        print(f"Image error for product {product.id}: {image_error}")
+        try:
+            await message.answer(
+                caption,
+                reply_markup=markup,
+                parse_mode="HTML"
+            )
+        except Exception as send_error:
+            print(f"Error displaying product {product.id}: {send_error}")
 
-                    # Create inline keyboard for quantity control
-                    builder = InlineKeyboardBuilder()
+# Helper function to build one page of a category listing
+def build_category_page(category: Category, products: list, page: int, pages_count: int, cart_quantities: dict, user_language: str, price_label: str):
+    """Build (text, reply_markup) for a paginated category message from preloaded data."""
+    category_name = get_localized_category_name(category, user_language)
+    text = f"🥩 <b>{category_name}</b> ({page + 1}/{pages_count})\n\n"
 
-                    # Check if user has this product in cart
-                    user_cart_item = await session.scalar(
-                        select(CartItem)
-                        .where(CartItem.user_id == user.id)
-                        .where(CartItem.product_id == product.id)
-                    )
+    builder = InlineKeyboardBuilder()
+    for number, product in enumerate(products, start=page * CATALOG_PAGE_SIZE + 1):
+        product_name = get_localized_product_name(product, user_language)
+        unit_display = "kg" if user_language == "de" and product.unit == "кг" else product.unit
+        text += f"{number}. <b>{product_name}</b> — {price_label}: {product.price} €/{unit_display}"
+        quantity = cart_quantities.get(product.id, 0)
+        if quantity:
+            text += f" 🛒 {quantity}"
+        text += "\n"
+        builder.row(InlineKeyboardButton(text=f"{number}. {product_name}", callback_data=f"product_{product.id}"))
+
+    # Prev/next navigation
+    nav_buttons = []
+    if page > 0:
+        nav_buttons.append(InlineKeyboardButton(text="⬅️", callback_data=f"catpage_{category.id}_{page - 1}"))
+    if page < pages_count - 1:
+        nav_buttons.append(InlineKeyboardButton(text="➡️", callback_data=f"catpage_{category.id}_{page + 1}"))
+    if nav_buttons:
+        builder.row(*nav_buttons)
+
+    back_text = "⬅️ Назад до категорій" if user_language == "uk" else "⬅️ Zurück zu Kategorien"
+    nav_row = [InlineKeyboardButton(text=back_text, callback_data="back_to_categories")]
+    if cart_quantities:
+        cart_btn_text = "🛒 Перейти до кошика" if user_language == "uk" else "🛒 Zum Warenkorb"
+        nav_row.append(InlineKeyboardButton(text=cart_btn_text, callback_data="go_to_cart"))
+    builder.row(*nav_row)
+
+    return text, builder.as_markup()
+
+async def show_category_page(callback: CallbackQuery, category_id: int, page: int, user: User = None):
+    """Show one page of a category in the callback's message, editing it in place."""
+    async with async_session() as session:
+        user_language = user.language_pref.value if user and user.language_pref else "uk"
+
+        category = await session.get(Category, category_id)
+        if not category:
+            error_msg = "Категорію не знайдено." if user_language == "uk" else "Kategorie nicht gefunden."
+            await callback.answer(error_msg)
+            return
+
+        product_ids = await category_index.get_product_ids(category_id)
+        if not product_ids:
+            error_msg = "У цій категорії немає товарів." if user_language == "uk" else "Keine Produkte in dieser Kategorie."
+            await callback.answer(error_msg)
+            return
+
+        page, pages_count, start, end = get_page_bounds(len(product_ids), page)
+        products = await session.scalars(
+            select(Product)
+            .where(Product.id.in_(product_ids[start:end]))
+            .where(Product.availability_status == AvailabilityStatus.IN_STOCK)
+            .order_by(Product.id)
+        )
+        products = products.all()
+
+        cart_quantities = await load_cart_quantities(session, user.id) if user else {}
+        price_label = await get_translation("price_label", user_language)
+
+    text, markup = build_category_page(category, products, page, pages_count, cart_quantities, user_language, price_label)
+    try:
+        await callback.message.edit_text(text, reply_markup=markup, parse_mode="HTML")
+    except TelegramBadRequest as edit_error:
+        if "message is not modified" not in str(edit_error):
+            # The message can't be edited (e.g. a photo card): send the page as a new message
+            await callback.message.answer(text, reply_markup=markup, parse_mode="HTML")
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("catpage_"))
+async def paginate_category(callback: CallbackQuery, db_user: User = None):
+    try:
+        _, category_id, page = callback.data.split("_")
+        await show_category_page(callback, int(category_id), int(page), db_user)
+    except Exception as e:
+        print(f"Error in paginate_category: {e}")
+        await callback.answer("Сталася помилка при завантаженні товарів.")
 
-                    current_quantity = user_cart_item.quantity if user_cart_item else 0
-
-                    # Add quantity control buttons
-                    if is_order_allowed():
-                        builder.button(text="-", callback_data=f"decrease_{product.id}")
-                        builder.button(text=f"В кошику: {current_quantity}", callback_data="qty")
-                        builder.button(text="+", callback_data=f"increase_{product.id}")
-                    else:
-                        builder.button(text="-", callback_data="disabled")
-                        builder.button(text=f"В кошику: {current_quantity}", callback_data="qty")
-                        builder.button(text="+", callback_data="disabled")
-
-                    builder.adjust(3)
-
-                    # Add navigation buttons
-                    builder.row()
-                    back_text = "⬅️ Назад до категорій" if user_language == "uk" else "⬅️ Zurück zu Kategorien"
-                    builder.button(text=back_text, callback_data="back_to_categories")
-
-                    # Check if user has items in cart
-                    cart_count = await session.scalar(
-                        select(sqlalchemy.func.count())
-                        .select_from(CartItem)
-                        .where(CartItem.user_id == user.id)
-                    )
+@router.callback_query(F.data.startswith("product_"))
+async def show_product(callback: CallbackQuery, db_user: User = None):
+    """Send a single product card opened from a paginated category page."""
+    try:
+        product_id = int(callback.data.split("_")[1])
+        user = db_user
 
-                    if cart_count > 0:
-                        cart_text = "🛒 Перейти до кошика" if user_language == "uk" else "🛒 Zum Warenkorb"
-                        builder.button(text=cart_text, callback_data="go_to_cart")
-
-                    # Send product card with better error handling
-                    try:
-                        if product.image_path and os.path.exists(f"static/uploads/{product.image_path}"):
-                            photo = FSInputFile(f"static/uploads/{product.image_path}")
-                            await callback.message.answer_photo(
-                                photo=photo,
-                                caption=caption,
-                                reply_markup=builder.as_markup(),
-                                parse_mode="HTML"
-                            )
-                        else:
-                            # Send text-only message if no image
-                            await callback.message.answer(
-                                caption,
-                                reply_markup=builder.as_markup(),
-                                parse_mode="HTML"
-                            )
-                    except Exception as image_error:
-                        # If image sending fails, send text-only as fallback
-                        print(f"Image error for product {product.id}: {image_error}")
-                        await callback.message.answer(
-                            caption,
-                            reply_markup=builder.as_markup(),
-                            parse_mode="HTML"
-                        )
+        async with async_session() as session:
+            user_language = user.language_pref.value if user and user.language_pref else "uk"
 
-                except Exception as product_error:
-                    print(f"Error displaying product {product.id}: {product_error}")
-                    # Continue with next product instead of failing completely
-                    continue
+            product = await session.get(Product, product_id)
+            if not product:
+                error_msg = "Товар не знайдено." if user_language == "uk" else "Produkt nicht gefunden."
+                await callback.answer(error_msg)
+                return
 
-            await callback.answer()
+            cart_quantities = await load_cart_quantities(session, user.id) if user else {}
+            price_label = await get_translation("price_label", user_language)
+
+        caption, markup = build_product_card(
+            product,
+            cart_quantities.get(product.id, 0),
+            len(cart_quantities),
+            user_language,
+            price_label
+        )
+        await send_product_card(callback.message, product, caption, markup)
+        await callback.answer()
     except Exception as e:
-        print(f"Error in show_category_products: {e}")
+        print(f"Error in show_product: {e}")
         await callback.answer("Сталася помилка при завантаженні товарів.")
 
 # Quantity control handlers
 @router.callback_query(F.data.startswith("increase_"))
-async def increase_quantity(callback: CallbackQuery):
+async def increase_quantity(callback: CallbackQuery, db_user: User = None):
     if not is_order_allowed():
         await callback.answer("Замовлення на цю суботу закрито!", show_alert=True)
         return
 
     try:
         product_id = int(callback.data.split("_")[1])
-        tg_user_id = callback.from_user.id
-
-        async with async_session() as session:
-            # Get user object first
-            user = await session.scalar(select(User).where(User.tg_id == tg_user_id))
-            if not user:
-                await callback.answer("Користувача не знайдено.")
-                return
-
-            # Get or create cart item using internal user ID
-            cart_item = await session.scalar(
-                select(CartItem)
-                .where(CartItem.user_id == user.id)
-                .where(CartItem.product_id == product_id)
-            )
-            
-            if cart_item:
-                cart_item.quantity += 1.0
-            else:
-                cart_item = CartItem(
-                    user_id=user.id,
-                    product_id=product_id,
-                    quantity=1.0
-                )
-                session.add(cart_item)
-
-            await session.commit()
-
-            # Update message to show new quantity
-            await update_product_message(callback.message, product_id, user.id)
-            await callback.answer(f"Додано до кошика. Кількість: {cart_item.quantity}")
+        user = db_user
+        if not user:
+            await callback.answer("Користувача не знайдено.")
+            return
+
+        # Acknowledge instantly; the DB write and message edit happen once after a quiet window
+        cart_taps.tap(callback.message, user, product_id, 1.0)
+        await callback.answer()
     except Exception as e:
         await callback.answer("Сталася помилка при оновленні кошика.")
 
 @router.callback_query(F.data.startswith("decrease_"))
-async def decrease_quantity(callback: CallbackQuery):
+async def decrease_quantity(callback: CallbackQuery, db_user: User = None):
     try:
         product_id = int(callback.data.split("_")[1])
-        tg_user_id = callback.from_user.id
-
-        async with async_session() as session:
-            # Get user object first
-            user = await session.scalar(select(User).where(User.tg_id == tg_user_id))
-            if not user:
-                await callback.answer("Користувача не знайдено.")
-                return
-
-            # Get cart item using internal user ID
-            cart_item = await session.scalar(
-                select(CartItem)
-                .where(CartItem.user_id == user.id)
-                .where(CartItem.product_id == product_id)
-            )
-            
-            if cart_item:
-                if cart_item.quantity > 1:
-                    cart_item.quantity -= 1.0
-                    await session.commit()
-
-                    # Update message to show new quantity
-                    await update_product_message(callback.message, product_id, user.id)
-                    await callback.answer(f"Зменшено кількість. Кількість: {cart_item.quantity}")
-                else:
-                    await session.delete(cart_item)
-                    await session.commit()
-
-                    # Update message to show new quantity
-                    await update_product_message(callback.message, product_id, user.id)
-                    await callback.answer("Товар видалено з кошика.")
-            else:
-                await callback.answer("Товар не знайдено в кошику.")
+        user = db_user
+        if not user:
+            await callback.answer("Користувача не знайдено.")
+            return
+
+        # Acknowledge instantly; the DB write and message edit happen once after a quiet window
+        cart_taps.tap(callback.message, user, product_id, -1.0)
+        await callback.answer()
     except Exception as e:
         await callback.answer("Сталася помилка при оновленні кошика.")
 
 # Navigation handlers
 @router.callback_query(F.data == "back_to_categories")
-async def back_to_categories(callback: CallbackQuery):
+async def back_to_categories(callback: CallbackQuery, db_user: User = None):
     try:
         async with async_session() as session:
-            # Get user language preference
-            user = await session.scalar(select(User).where(User.tg_id == callback.from_user.id))
-            user_language = user.language_pref.value if user and user.language_pref else "uk"
+            # User language preference comes from the per-update user context
+            user_language = db_user.language_pref.value if db_user and db_user.language_pref else "uk"
 
             # Get all categories
             categories = await session.scalars(select(Category))
@@ -345,88 +439,54 @@ async def go_to_cart(callback: CallbackQuery):
     await callback.answer("Функціонал кошика ще не реалізовано.")
 
 # Helper function to update product message with new quantity
-async def update_product_message(message: Message, product_id: int, user_id: int):
+async def update_product_message(message: Message, product_id: int, user: User):
     try:
+        user_language = user.language_pref.value if user.language_pref else "uk"
         async with async_session() as session:
-            # Get user language preference
-            user = await session.scalar(select(User).where(User.tg_id == user_id))
-            user_language = user.language_pref.value if user and user.language_pref else "uk"
 
-            # Get product and cart item
+            # Get product and the user's cart in one pass
             product = await session.get(Product, product_id)
-            cart_item = await session.scalar(
-                select(CartItem)
-                .where(CartItem.user_id == user_id)
-                .where(CartItem.product_id == product_id)
-            )
-
             if not product:
                 return
 
-            current_quantity = cart_item.quantity if cart_item else 0
-
-            # Build updated caption with localized content
-            product_name = get_localized_product_name(product, user_language)
-            product_description = get_localized_product_description(product, user_language)
-
-            # Get localized price label
+            cart_quantities = await load_cart_quantities(session, user.id)
             price_label = await get_translation("price_label", user_language)
 
-            # Translate unit for German users
-            unit_display = "kg" if user_language == "de" and product.unit == "кг" else product.unit
-
-            caption = f"<b>{product_name}</b>\n\n"
-            if product_description:
-                caption += f"{product_description}\n\n"
-            caption += f"💶 {price_label}: {product.price} €/{unit_display}"
-
-            # Create updated inline keyboard
-            builder = InlineKeyboardBuilder()
-
-            if is_order_allowed():
-                builder.button(text="-", callback_data=f"decrease_{product.id}")
-                cart_text = f"В кошику: {current_quantity}" if user_language == "uk" else f"Im Warenkorb: {current_quantity}"
-                builder.button(text=cart_text, callback_data="qty")
-                builder.button(text="+", callback_data=f"increase_{product.id}")
-            else:
-                builder.button(text="-", callback_data="disabled")
-                cart_text = f"В кошику: {current_quantity}" if user_language == "uk" else f"Im Warenkorb: {current_quantity}"
-                builder.button(text=cart_text, callback_data="qty")
-                builder.button(text="+", callback_data="disabled")
-
-            builder.adjust(3)
-
-            # Add navigation buttons
-            builder.row()
-            back_text = "⬅️ Назад до категорій" if user_language == "uk" else "⬅️ Zurück zu Kategorien"
-            builder.button(text=back_text, callback_data="back_to_categories")
-
-            # Check if user has items in cart
-            cart_count = await session.scalar(
-                select(sqlalchemy.func.count())
-                .select_from(CartItem)
-                .where(CartItem.user_id == user_id)
+            caption, markup = build_product_card(
+                product,
+                cart_quantities.get(product_id, 0),
+                len(cart_quantities),
+                user_language,
+                price_label
             )
 
-            if cart_count > 0:
-                cart_btn_text = "🛒 Перейти до кошика" if user_language == "uk" else "🛒 Zum Warenkorb"
-                builder.button(text=cart_btn_text, callback_data="go_to_cart")
-
             # Edit the original message with better error handling
             try:
                 if product.image_path and os.path.exists(f"static/uploads/{product.image_path}"):
                     await message.edit_caption(
                         caption=caption,
-                        reply_markup=builder.as_markup(),
+                        reply_markup=markup,
                         parse_mode="HTML"
                     )
                 else:
                     await message.edit_text(
                         text=caption,
-                        reply_markup=builder.as_markup(),
+                        reply_markup=markup,
                         parse_mode="HTML"
                     )
             except Exception as edit_error:
                 print(f"Error editing message for product {product_id}: {edit_error}")
     except Exception as e:
-        print(f"Error updating product message: {e}")
\ No newline at end of file
+        print(f"Error updating product message: {e}")
+
+# Refresh a product message once after coalesced cart taps were written;
+# the edited card shows the quantity that is actually in the cart
+async def refresh_cart_message(message: Message, user: User, quantities: dict):
+    for product_id in quantities:
+        await update_product_message(message, product_id, user)
+
+cart_taps = CartTapCoalescer(
+    refresh_cart_message,
+    quiet_window=float(os.getenv("CART_TAP_QUIET_WINDOW", "0.7")),
+    error_text="Сталася помилка при оновленні кошика."
+)
@@ -1,56 +1,53 @@
+import os
+from dotenv import load_dotenv
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, WebAppInfo
-from sqlalchemy import select
-from core.database import async_session
-from core.models import Translation
+from bot.utils import translation_registry, get_translations
+
+load_dotenv()
+
+# Public base URL of the Flask app serving /webapp (e.g. https://shop.example.com)
+WEBAPP_URL = os.getenv("WEBAPP_URL", "").rstrip("/")
+
+# Fallback labels used when a translation key is missing
+MENU_DEFAULTS = {
+    "catalog_button": "🥩 Catalog",
+    "cart_button": "🛒 Cart",
+    "orders_button": "📋 Orders",
+    "profile_button": "👤 Profile",
+    "impressum_button": "ℹ️ Impressum",
+}
+
+# Memoised keyboards: (language, translations generation, webapp url) -> ReplyKeyboardMarkup
+_keyboard_cache = {}
+
+def build_main_menu_keyboard(labels: dict, user_language: str, webapp_url: str) -> ReplyKeyboardMarkup:
+    """Build the main menu keyboard from already resolved labels."""
+    def web_app(query: str):
+        return WebAppInfo(url=f"{webapp_url}/webapp?{query}") if webapp_url else None
+
+    keyboard = [
+        [KeyboardButton(text=labels["catalog_button"], web_app=web_app(f"lang={user_language}"))],
+        [KeyboardButton(text=labels["cart_button"], web_app=web_app(f"lang={user_language}&start_mode=cart")), KeyboardButton(text=labels["orders_button"])],
+        [KeyboardButton(text=labels["profile_button"]), KeyboardButton(text=labels["impressum_button"])]
+    ]
+    return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True, persistent=True)
 
 async def get_main_menu_keyboard(user_language="uk"):
-    """Get main menu keyboard with localized button labels from database."""
+    """Get main menu keyboard with localized button labels, memoised per language."""
     try:
-        async with async_session() as session:
-            # Fetch translations for main menu buttons
-            catalog_trans = await session.scalar(
-                select(Translation).where(Translation.key == "catalog_button")
-            )
-            cart_trans = await session.scalar(
-                select(Translation).where(Translation.key == "cart_button")
-            )
-            orders_trans = await session.scalar(
-                select(Translation).where(Translation.key == "orders_button")
-            )
-            profile_trans = await session.scalar(
-                select(Translation).where(Translation.key == "profile_button")
-            )
-            impressum_trans = await session.scalar(
-                select(Translation).where(Translation.key == "impressum_button")
-            )
-
-            # Get localized text based on user language
-            catalog_text = (catalog_trans.value_de if user_language == "de" and catalog_trans.value_de
-                          else catalog_trans.value_uk if catalog_trans else "🥩 Catalog")
-
-            cart_text = (cart_trans.value_de if user_language == "de" and cart_trans.value_de
-                        else cart_trans.value_uk if cart_trans else "🛒 Cart")
-
-            orders_text = (orders_trans.value_de if user_language == "de" and orders_trans.value_de
-                          else orders_trans.value_uk if orders_trans else "📋 Orders")
-
-            profile_text = (profile_trans.value_de if user_language == "de" and profile_trans.value_de
-                          else profile_trans.value_uk if profile_trans else "👤 Profile")
-
-            impressum_text = (impressum_trans.value_de if user_language == "de" and impressum_trans.value_de
-                            else impressum_trans.value_uk if impressum_trans else "ℹ️ Impressum")
-
-            keyboard = [
-                [KeyboardButton(text=catalog_text, web_app=WebAppInfo(url=f"https://7568db916eec.ngrok-free.app/webapp?lang={user_language}"))],
-                [KeyboardButton(text=cart_text, web_app=WebAppInfo(url=f"https://7568db916eec.ngrok-free.app/webapp?lang={user_language}&start_mode=cart")), KeyboardButton(text=orders_text)],
-                [KeyboardButton(text=profile_text), KeyboardButton(text=impressum_text)]
-            ]
-            return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True, persistent=True)
+        translations = await get_translations(MENU_DEFAULTS.keys(), user_language)
     except Exception as e:
         # Fallback to hardcoded English if database error
-        keyboard = [
-            [KeyboardButton(text="🥩 Catalog", web_app=WebAppInfo(url=f"https://7568db916eec.ngrok-free.app/webapp?lang={user_language}"))],
-            [KeyboardButton(text="🛒 Cart", web_app=WebAppInfo(url=f"https://7568db916eec.ngrok-free.app/webapp?lang={user_language}&start_mode=cart")), KeyboardButton(text="📋 Orders")],
-            [KeyboardButton(text="👤 Profile"), KeyboardButton(text="ℹ️ Impressum")]
-        ]
-        return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True, persistent=True)
\ No newline at end of file
+        print(f"Error building main menu: {e}")
+        return build_main_menu_keyboard(MENU_DEFAULTS, user_language, WEBAPP_URL)
+
+    cache_key = (user_language, translation_registry.generation, WEBAPP_URL)
+    keyboard = _keyboard_cache.get(cache_key)
+    if keyboard is None:
+        labels = {key: text if text != key else MENU_DEFAULTS[key] for key, text in translations.items()}
+        keyboard = build_main_menu_keyboard(labels, user_language, WEBAPP_URL)
+        # Keep only keyboards built from the current translations
+        for stale_key in [k for k in _keyboard_cache if k[1:] != cache_key[1:]]:
+            del _keyboard_cache[stale_key]
+        _keyboard_cache[cache_key] = keyboard
+    return keyboard
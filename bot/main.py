@@ -6,18 +6,45 @@ from aiogram import Bot, Dispatcher
 from bot.handlers.start import router as start_router
 from bot.handlers.store import router as store_router
 from bot.handlers.order import router as order_router
+from bot.utils import translation_registry
+from bot.services.sender import send_scheduler
+from bot.middlewares.user_context import UserContextMiddleware
 
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Seconds between send scheduler metric logs (0 disables them)
+BOT_STATS_INTERVAL = float(os.getenv("BOT_STATS_INTERVAL", "300"))
 
 bot = Bot(token=BOT_TOKEN)
+# Every outbound Bot API call goes through the rate-limited send scheduler
+bot.session.middleware(send_scheduler)
 dp = Dispatcher()
+# Resolve the sender's User row once per update and inject it as `db_user`
+dp.update.outer_middleware(UserContextMiddleware())
 
 dp.include_router(start_router)
 dp.include_router(store_router)
 dp.include_router(order_router)
 
+# Background tasks started with the bot, kept referenced until shutdown
+background_tasks = set()
+
+async def on_startup():
+    # Build the translation registry and the button reverse index before polling
+    await translation_registry.load()
+    if BOT_STATS_INTERVAL > 0:
+        background_tasks.add(asyncio.create_task(send_scheduler.log_stats(BOT_STATS_INTERVAL)))
+
+async def on_shutdown():
+    for task in background_tasks:
+        task.cancel()
+    print(f"Translation registry stats: {translation_registry.stats()}")
+    print(f"Send scheduler stats: {send_scheduler.stats()}")
+
+dp.startup.register(on_startup)
+dp.shutdown.register(on_shutdown)
+
 async def main():
     await dp.start_polling(bot)
 
@@ -0,0 +1,62 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy import select
+from core.database import async_session
+from core.models import User
+
+# Small TTL + LRU cache of User rows keyed by Telegram ID
+class UserCache:
+    def __init__(self, ttl: float = 60.0, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # tg_id -> (loaded_at, user or None)
+        self.hits = 0
+        self.misses = 0
+
+    async def get_user(self, tg_id: int):
+        """Get the (detached) User for a Telegram ID, querying the database at most once per TTL."""
+        entry = self._entries.get(tg_id)
+        if entry and time.monotonic() - entry[0] <= self.ttl:
+            self._entries.move_to_end(tg_id)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        async with async_session() as session:
+            user = await session.scalar(select(User).where(User.tg_id == tg_id))
+        self._entries[tg_id] = (time.monotonic(), user)
+        self._entries.move_to_end(tg_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, tg_id: int):
+        """Forget a cached user after it was written (language, onboarding, ...)."""
+        self._entries.pop(tg_id, None)
+
+user_cache = UserCache(ttl=float(os.getenv("USER_CACHE_TTL", "60")))
+
+# Outer middleware: resolve the user once per update and inject it as `db_user`
+class UserContextMiddleware(BaseMiddleware):
+    def __init__(self, cache: UserCache = user_cache):
+        self.cache = cache
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        from_user = data.get("event_from_user")
+        db_user = None
+        if from_user:
+            try:
+                db_user = await self.cache.get_user(from_user.id)
+            except Exception as e:
+                print(f"Error loading user {from_user.id}: {e}")
+        data["db_user"] = db_user
+        return await handler(event, data)
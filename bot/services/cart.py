@@ -0,0 +1,106 @@
+import asyncio
+import weakref
+from sqlalchemy import update, delete
+from sqlalchemy.dialects.postgresql import insert
+from core.database import async_session
+from core.models import CartItem
+
+async def change_cart_quantity(session, user_id: int, product_id: int, delta: float):
+    """Atomically change a cart item's quantity by `delta` and return the new quantity.
+
+    Returns None if `delta` is negative and the product is not in the cart.
+    A quantity that drops to zero or below removes the row and returns 0.
+    The caller commits the session.
+    """
+    if delta > 0:
+        # INSERT ... ON CONFLICT DO UPDATE ... RETURNING: one round-trip, no duplicate rows
+        stmt = (
+            insert(CartItem)
+            .values(user_id=user_id, product_id=product_id, quantity=delta)
+            .on_conflict_do_update(
+                index_elements=[CartItem.user_id, CartItem.product_id],
+                set_={"quantity": CartItem.quantity + delta}
+            )
+            .returning(CartItem.id, CartItem.quantity)
+        )
+    else:
+        stmt = (
+            update(CartItem)
+            .where(CartItem.user_id == user_id)
+            .where(CartItem.product_id == product_id)
+            .values(quantity=CartItem.quantity + delta)
+            .returning(CartItem.id, CartItem.quantity)
+        )
+
+    row = (await session.execute(stmt)).first()
+    if row is None:
+        return None
+
+    cart_item_id, quantity = row
+    if quantity <= 0:
+        await session.execute(delete(CartItem).where(CartItem.id == cart_item_id))
+        return 0
+    return quantity
+
+# Coalesces rapid +/- taps of one user on the same message into one DB write and one message edit
+class CartTapCoalescer:
+    def __init__(self, on_flush, quiet_window: float = 0.7, error_text: str = None):
+        # on_flush(message, user, {product_id: new_quantity_or_None}) refreshes the message once;
+        # error_text is sent to the chat if the write fails (the taps' callbacks are long answered)
+        self.on_flush = on_flush
+        self.quiet_window = quiet_window
+        self.error_text = error_text
+        self._pending = {}  # (chat_id, message_id, user_id) -> pending taps
+        # Running flush tasks; the event loop itself only keeps weak references
+        self._tasks = set()
+        # Per-message locks disappear once no flush holds a reference to them
+        self._locks = weakref.WeakValueDictionary()
+        self.taps = 0
+        self.flushes = 0
+
+    def tap(self, message, user, product_id: int, delta: float):
+        """Record a tap; the caller answers its callback right away, the written quantity shows up in the edited message."""
+        # Per user: in a group chat several people can tap the same card
+        key = (message.chat.id, message.message_id, user.id)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = {"message": message, "user": user, "deltas": {}, "task": None}
+        pending["deltas"][product_id] = pending["deltas"].get(product_id, 0.0) + delta
+        # Restart the quiet window on every tap
+        if pending["task"] is not None:
+            pending["task"].cancel()
+        task = pending["task"] = asyncio.create_task(self._flush_later(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.taps += 1
+
+    async def _flush_later(self, key):
+        await asyncio.sleep(self.quiet_window)
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        try:
+            # Flushes of the same message never overlap, so edits are applied in order
+            async with lock:
+                await self._flush(pending)
+        except Exception as e:
+            print(f"Error flushing cart taps for message {key}: {e}")
+            if self.error_text:
+                try:
+                    await pending["message"].answer(self.error_text)
+                except Exception:
+                    pass
+
+    async def _flush(self, pending):
+        quantities = {}
+        async with async_session() as session:
+            for product_id, delta in pending["deltas"].items():
+                if delta:
+                    quantities[product_id] = await change_cart_quantity(session, pending["user"].id, product_id, delta)
+            await session.commit()
+        self.flushes += 1
+        if quantities:
+            await self.on_flush(pending["message"], pending["user"], quantities)
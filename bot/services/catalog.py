@@ -0,0 +1,49 @@
+import asyncio
+import os
+import time
+from sqlalchemy import select
+from core.database import async_session
+from core.models import Category, Product, AvailabilityStatus
+
+CATALOG_BROWSE_MODE = os.getenv("CATALOG_BROWSE_MODE", "pages")  # "pages" or "cards"
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", "8"))
+
+# Cached category -> in-stock product id list used by paginated browsing.
+# Stock and categories are edited in the admin, a separate process, so the TTL is the only refresh:
+# new or re-categorised products show up within CATALOG_INDEX_TTL seconds. Pages still re-check
+# stock when they load, so a product that went out of stock disappears right away.
+class CategoryProductIndex:
+    def __init__(self, ttl: float = 120.0):
+        self.ttl = ttl
+        self._entries = {}  # category_id -> (loaded_at, [product_id, ...])
+        self._lock = asyncio.Lock()
+
+    async def get_product_ids(self, category_id: int) -> list:
+        """Get ordered in-stock product ids for a category, loading them at most once per TTL."""
+        entry = self._entries.get(category_id)
+        if entry and time.monotonic() - entry[0] <= self.ttl:
+            return entry[1]
+        async with self._lock:
+            entry = self._entries.get(category_id)
+            if entry and time.monotonic() - entry[0] <= self.ttl:
+                return entry[1]
+            async with async_session() as session:
+                product_ids = await session.scalars(
+                    select(Product.id).distinct()
+                    .join(Product.categories)
+                    .where(Category.id == category_id)
+                    .where(Product.availability_status == AvailabilityStatus.IN_STOCK)
+                    .order_by(Product.id)
+                )
+                product_ids = product_ids.all()
+            self._entries[category_id] = (time.monotonic(), product_ids)
+            return product_ids
+
+category_index = CategoryProductIndex(ttl=float(os.getenv("CATALOG_INDEX_TTL", "120")))
+
+def get_page_bounds(total: int, page: int, page_size: int = CATALOG_PAGE_SIZE):
+    """Clamp the page number and return (page, pages_count, start, end)."""
+    pages_count = max(1, (total + page_size - 1) // page_size)
+    page = min(max(page, 0), pages_count - 1)
+    start = page * page_size
+    return page, pages_count, start, min(start + page_size, total)
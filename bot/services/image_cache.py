@@ -0,0 +1,83 @@
+import asyncio
+import os
+from aiogram.types import FSInputFile, Message
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from core.database import async_session
+from core.models import TelegramFileCache
+from core.utils.images import bot_photo_path
+
+UPLOADS_DIR = "static/uploads"
+
+# Persistent image -> Telegram file_id cache so each upload is sent to Telegram only once.
+# The table is read once per process; entries are validated against the file's mtime on every use,
+# so an image replaced in the admin is re-uploaded without any signal from the admin process.
+class ImageFileIdCache:
+    def __init__(self, base_dir: str = UPLOADS_DIR):
+        self.base_dir = base_dir
+        self._entries = {}  # image_path -> (mtime_ns, file_id)
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def _mtime_ns(self, image_path: str):
+        try:
+            return os.stat(os.path.join(self.base_dir, image_path)).st_mtime_ns
+        except OSError:
+            return None
+
+    async def _ensure_loaded(self):
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            async with async_session() as session:
+                rows = await session.execute(
+                    select(TelegramFileCache.image_path, TelegramFileCache.mtime_ns, TelegramFileCache.file_id)
+                )
+                self._entries = {image_path: (mtime_ns, file_id) for image_path, mtime_ns, file_id in rows}
+            self._loaded = True
+
+    async def get_photo(self, image_path: str):
+        """Get a cached file_id for the image, an FSInputFile to upload, or None if the file is missing."""
+        if not image_path:
+            return None
+        mtime_ns = self._mtime_ns(image_path)
+        if mtime_ns is None:
+            return None
+        try:
+            await self._ensure_loaded()
+        except Exception as e:
+            print(f"Error loading file_id cache: {e}")
+        entry = self._entries.get(image_path)
+        if entry and entry[0] == mtime_ns:
+            return entry[1]
+        # Upload the 1280px JPEG derivative rather than the original (resized once, off the event loop)
+        path = await asyncio.to_thread(bot_photo_path, image_path)
+        return FSInputFile(path) if path else None
+
+    async def remember(self, image_path: str, sent: Message):
+        """Store the file_id Telegram returned for a freshly uploaded image."""
+        if not image_path or not sent or not sent.photo:
+            return
+        mtime_ns = self._mtime_ns(image_path)
+        if mtime_ns is None:
+            return
+        file_id = sent.photo[-1].file_id
+        entry = self._entries.get(image_path)
+        if entry and entry == (mtime_ns, file_id):
+            return
+        self._entries[image_path] = (mtime_ns, file_id)
+        try:
+            async with async_session() as session:
+                stmt = insert(TelegramFileCache).values(image_path=image_path, mtime_ns=mtime_ns, file_id=file_id)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[TelegramFileCache.image_path],
+                    set_={"mtime_ns": mtime_ns, "file_id": file_id}
+                )
+                await session.execute(stmt)
+                await session.commit()
+        except Exception as e:
+            print(f"Error saving file_id for {image_path}: {e}")
+
+image_cache = ImageFileIdCache()
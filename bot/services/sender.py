@@ -0,0 +1,178 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+# Send priorities: interactive replies always win over bulk sends
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+send_priority: ContextVar[str] = ContextVar("send_priority", default=INTERACTIVE)
+
+@contextmanager
+def bulk_sends():
+    """Mark every Bot API call made inside the block as a bulk (low priority) send."""
+    token = send_priority.set(BULK)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float, reserve: float = 0.0) -> float:
+        """Seconds until a token is available while keeping `reserve` tokens untouched."""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        missing = 1.0 + reserve - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def consume(self):
+        self.tokens -= 1.0
+
+    def block(self, now: float, seconds: float):
+        """Stop handing out tokens for `seconds` (Telegram asked us to back off)."""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = now
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+# Central outbound scheduler registered as a Bot session middleware
+class SendScheduler(BaseRequestMiddleware):
+    def __init__(self, global_rate: float = 25.0, chat_rate: float = 1.0, chat_burst: float = 3.0,
+                 bulk_reserve: float = 5.0, max_retries: int = 3):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        # Global tokens that bulk sends may not use, kept free for interactive replies
+        self.bulk_reserve = min(bulk_reserve, global_rate - 1)
+        self.max_retries = max_retries
+        self._chat_buckets = {}
+        # chat_id -> interactive sends waiting for that chat's bucket
+        self._interactive_waiting = {}
+        self._last_prune = time.monotonic()
+        # Metrics
+        self.queue_depth = {INTERACTIVE: 0, BULK: 0}
+        self.max_queue_depth = 0
+        self.sent = {INTERACTIVE: 0, BULK: 0}
+        self.retried = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _prune(self, now: float):
+        # Drop buckets of chats that have been quiet long enough to be full again
+        if now - self._last_prune < 60:
+            return
+        self._chat_buckets = {chat_id: bucket for chat_id, bucket in self._chat_buckets.items() if not bucket.is_idle(now)}
+        self._last_prune = now
+
+    async def _acquire(self, chat_id, priority: str):
+        chat_bucket = self._chat_bucket(chat_id)
+        reserve = self.bulk_reserve if priority == BULK else 0.0
+        if priority == INTERACTIVE:
+            self._interactive_waiting[chat_id] = self._interactive_waiting.get(chat_id, 0) + 1
+        try:
+            while True:
+                now = time.monotonic()
+                # Check and consume without awaiting in between, so the decision is atomic
+                delay = max(chat_bucket.wait_time(now), self.global_bucket.wait_time(now, reserve))
+                # In the same chat, bulk sends step aside while an interactive reply is waiting
+                if priority == BULK and self._interactive_waiting.get(chat_id):
+                    delay = max(delay, 1.0 / chat_bucket.rate)
+                if delay <= 0:
+                    chat_bucket.consume()
+                    self.global_bucket.consume()
+                    return
+                await asyncio.sleep(delay)
+        finally:
+            if priority == INTERACTIVE:
+                waiting = self._interactive_waiting[chat_id] - 1
+                if waiting:
+                    self._interactive_waiting[chat_id] = waiting
+                else:
+                    del self._interactive_waiting[chat_id]
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            # Not a chat-bound call (callback answers, getUpdates, ...): no throttling
+            return await make_request(bot, method)
+
+        priority = send_priority.get()
+        attempt = 0
+        while True:
+            enqueued_at = time.monotonic()
+            self.queue_depth[priority] += 1
+            self.max_queue_depth = max(self.max_queue_depth, sum(self.queue_depth.values()))
+            try:
+                await self._acquire(chat_id, priority)
+            finally:
+                self.queue_depth[priority] -= 1
+            waited = time.monotonic() - enqueued_at
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+            try:
+                response = await make_request(bot, method)
+                self.sent[priority] += 1
+                self._prune(time.monotonic())
+                return response
+            except TelegramRetryAfter as e:
+                # Honour retry_after for this chat and try again
+                self._chat_bucket(chat_id).block(time.monotonic(), e.retry_after)
+                attempt += 1
+                if attempt > self.max_retries:
+                    self.failed += 1
+                    raise
+                self.retried += 1
+                print(f"Flood limit for chat {chat_id}: retry in {e.retry_after}s (attempt {attempt})")
+
+    def stats(self) -> dict:
+        """Return queue depth and latency metrics."""
+        sent = sum(self.sent.values())
+        return {
+            "queue_depth": dict(self.queue_depth),
+            "max_queue_depth": self.max_queue_depth,
+            "sent": dict(self.sent),
+            "retried": self.retried,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait / sent * 1000, 2) if sent else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "tracked_chats": len(self._chat_buckets),
+        }
+
+    async def log_stats(self, interval: float):
+        """Print the metrics every `interval` seconds while the bot runs."""
+        while True:
+            await asyncio.sleep(interval)
+            print(f"Send scheduler stats: {self.stats()}")
+
+send_scheduler = SendScheduler(
+    global_rate=float(os.getenv("BOT_GLOBAL_SEND_RATE", "25")),
+    chat_rate=float(os.getenv("BOT_CHAT_SEND_RATE", "1")),
+    chat_burst=float(os.getenv("BOT_CHAT_SEND_BURST", "3")),
+)
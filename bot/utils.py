@@ -1,15 +1,105 @@
+import asyncio
+import os
+import time
 from aiogram.filters import BaseFilter
 from aiogram.types import Message
 from sqlalchemy import select
 from core.database import async_session
 from core.models import Translation
 
+# Process-wide translation registry: the whole translations table is kept in memory.
+# Translations are edited in the admin, a separate process, so the TTL is the only refresh:
+# an edit reaches the bot within TRANSLATIONS_TTL seconds.
+class TranslationRegistry:
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        # Incremented on every successful load, so dependent caches notice TTL reloads too
+        self.generation = 0
+        self._values = {}
+        self._keys_by_text = {}
+        self._loaded_at = None
+        self._lock = asyncio.Lock()
+        # Filter counters: total evaluations and those answered by the reverse index
+        self.filter_evaluations = 0
+        self.filter_index_hits = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def is_stale(self) -> bool:
+        """Check whether the registry must be (re)loaded from the database."""
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    async def load(self):
+        """Load the whole translations table in a single query."""
+        async with self._lock:
+            if not self.is_stale():
+                return
+            async with async_session() as session:
+                rows = await session.execute(
+                    select(Translation.key, Translation.value_uk, Translation.value_de)
+                )
+                values = {key: (value_uk, value_de) for key, value_uk, value_de in rows}
+            # Reverse index: every language value -> keys that use it as a label
+            keys_by_text = {}
+            for key, (value_uk, value_de) in values.items():
+                for text in (value_uk, value_de):
+                    if text:
+                        keys_by_text.setdefault(text, set()).add(key)
+            self._values = values
+            self._keys_by_text = keys_by_text
+            self._loaded_at = time.monotonic()
+            self.generation += 1
+
+    async def ensure_loaded(self):
+        """Load the table on first use and reload it once the TTL expired."""
+        if self.is_stale():
+            try:
+                await self.load()
+            except Exception as e:
+                # Keep serving the previous snapshot if the database is unavailable
+                print(f"Error loading translations: {e}")
+
+    def lookup(self, translation_key: str, user_language: str = "uk") -> str:
+        """Get translation from memory without touching the database."""
+        values = self._values.get(translation_key)
+        if not values:
+            return translation_key
+        value_uk, value_de = values
+        if user_language == "de" and value_de:
+            return value_de
+        return value_uk or translation_key
+
+    def keys_for_text(self, text: str) -> frozenset:
+        """Get all translation keys whose value (in any language) equals the text."""
+        return self._keys_by_text.get(text, frozenset())
+
+    def stats(self) -> dict:
+        """Return registry counters for monitoring."""
+        return {
+            "generation": self.generation,
+            "keys": len(self._values),
+            "filter_evaluations": self.filter_evaluations,
+            "filter_index_hits": self.filter_index_hits,
+        }
+
+translation_registry = TranslationRegistry(ttl=float(os.getenv("TRANSLATIONS_TTL", "300")))
+
 # Centralized Translation Filter for multilingual button handling
 class TranslationFilter(BaseFilter):
     def __init__(self, key: str):
         self.key = key
 
     async def __call__(self, message: Message) -> bool:
+        if not message.text:
+            return False
+        await translation_registry.ensure_loaded()
+        translation_registry.filter_evaluations += 1
+        if translation_registry.is_loaded:
+            translation_registry.filter_index_hits += 1
+            return self.key in translation_registry.keys_for_text(message.text)
+        # Registry could not be loaded yet: fall back to a direct lookup
         async with async_session() as session:
             trans = await session.scalar(select(Translation).where(Translation.key == self.key))
             if not trans: return False
@@ -18,15 +108,11 @@ class TranslationFilter(BaseFilter):
 # Centralized translation helper function
 async def get_translation(translation_key: str, user_language: str = "uk") -> str:
     """Get translation for the given key in user's language."""
-    try:
-        async with async_session() as session:
-            translation = await session.scalar(
-                select(Translation).where(Translation.key == translation_key)
-            )
-            if translation:
-                if user_language == "de" and translation.value_de:
-                    return translation.value_de
-                return translation.value_uk or translation_key
-    except Exception as e:
-        print(f"Error getting translation for {translation_key}: {e}")
-    return translation_key
\ No newline at end of file
+    await translation_registry.ensure_loaded()
+    return translation_registry.lookup(translation_key, user_language)
+
+# Bulk translation helper for rendering a whole screen at once
+async def get_translations(translation_keys, user_language: str = "uk") -> dict:
+    """Get translations for several keys in user's language as a key -> text dict."""
+    await translation_registry.ensure_loaded()
+    return {key: translation_registry.lookup(key, user_language) for key in translation_keys}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Text, BigInteger, DateTime, ForeignKey, Enum, Table
+from sqlalchemy import Column, Integer, String, Float, Boolean, Text, BigInteger, DateTime, ForeignKey, Enum, Table, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 import datetime
@@ -40,6 +40,13 @@ class TransactionStatus(PyEnum):
     COMPLETED = "COMPLETED"
     FAILED = "FAILED"
 
+class JobStatus(PyEnum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
 class User(Base, UserMixin):
     __tablename__ = "users"
 
@@ -83,6 +90,10 @@ class Transaction(Base):
 
 class CartItem(Base):
     __tablename__ = "cart_items"
+    # One row per (user, product); also serves as the composite lookup index for carts
+    __table_args__ = (
+        UniqueConstraint("user_id", "product_id", name="uq_cart_items_user_product"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -228,4 +239,42 @@ class Translation(Base):
     id = Column(Integer, primary_key=True, index=True)
     key = Column(String, unique=True)
     value_uk = Column(Text)
-    value_de = Column(Text)
\ No newline at end of file
+    value_de = Column(Text)
+
+class TelegramFileCache(Base):
+    __tablename__ = "telegram_file_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    image_path = Column(String(255), unique=True, nullable=False)
+    mtime_ns = Column(BigInteger, nullable=False)
+    file_id = Column(String(255), nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    def __str__(self):
+        return f"{self.image_path} -> {self.file_id}"
+
+class AdminJob(Base):
+    __tablename__ = "admin_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False)  # 'import', 'dry_run', 'restore' or 'export'
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    rows_done = Column(Integer, default=0)
+    rows_total = Column(Integer, nullable=True)
+    errors_count = Column(Integer, default=0)
+    cancel_requested = Column(Boolean, default=False)
+    input_path = Column(String(255), nullable=True)
+    result_path = Column(String(255), nullable=True)
+    snapshot_path = Column(String(255), nullable=True)  # product tables before an import, until rolled back or purged
+    owner = Column(String(120), nullable=True)  # "host:pid:token" of the admin process running the job
+    result = Column(Text)  # import report or error message
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    user = relationship("User")
+
+    def __str__(self):
+        return f"#{self.id} {self.kind} ({self.status.value if self.status else 'QUEUED'})"
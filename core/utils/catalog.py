@@ -0,0 +1,281 @@
+from sqlalchemy import select, func, literal, null, tuple_, union_all
+from core.utils.images import image_url, image_srcset
+from core.models import Product, Category, Farm, Region, Translation, AvailabilityStatus, product_categories_association
+
+# Catalog serialization for the WebApp API.
+# Every function takes a sync SQLAlchemy session and runs a fixed number of queries,
+# regardless of how many rows the catalog holds.
+
+# Languages of the WebApp and the farm types it filters by (its farm type buttons)
+LANGUAGES = ('uk', 'de')
+FARM_TYPES = ('meat', 'vegetables', 'fish', 'poultry')
+
+def normalize_lang(lang) -> str:
+    """Any unsupported language falls back to Ukrainian, as the translations do."""
+    return lang if lang in LANGUAGES else 'uk'
+
+def serialize_translations(session, lang='uk') -> dict:
+    """Return all UI translations for one language as a key -> text dict."""
+    translations_dict = {}
+    for key, value_uk, value_de in session.execute(select(Translation.key, Translation.value_uk, Translation.value_de)):
+        if lang == 'de' and value_de:
+            translations_dict[key] = value_de
+        else:
+            translations_dict[key] = value_uk or key
+    return translations_dict
+
+def serialize_regions(session) -> list:
+    """Return all regions ordered by id."""
+    regions = session.execute(select(Region).order_by(Region.id)).scalars().all()
+    return [
+        {'id': region.id, 'name': region.name, 'name_de': region.name_de, 'slug': region.slug}
+        for region in regions
+    ]
+
+def serialize_farms(session, region_id=None, farm_type=None) -> list:
+    """Return active farms with their region name in a single query."""
+    query = (
+        select(Farm, Region.name.label('region_name'))
+        .outerjoin(Region, Farm.region_id == Region.id)
+        .where(Farm.is_active == True)
+    )
+    if region_id:
+        query = query.where(Farm.region_id == region_id)
+    if farm_type:
+        # Case-insensitive comparison
+        query = query.where(func.lower(Farm.farm_type) == farm_type.lower())
+
+    farms_data = []
+    for farm, region_name in session.execute(query.order_by(Farm.id)):
+        farms_data.append({
+            'id': farm.id,
+            'name': farm.name,
+            'description_uk': farm.description_uk,
+            'description_de': farm.description_de,
+            'location': farm.location,
+            'contact_info': farm.contact_info,
+            'image_path': farm.image_path,
+            'image_url': image_url(farm.image_path),
+            'image_srcset': image_srcset(farm.image_path),
+            'region_id': farm.region_id,
+            'region_name': region_name,
+            'farm_type': farm.farm_type
+        })
+    return farms_data
+
+def serialize_categories(session, farm_id=None) -> list:
+    """Return categories, optionally only those having products of the given farm."""
+    query = select(Category)
+    if farm_id:
+        # Filter categories that have products for this farm
+        query = query.join(Category.products).where(Product.farm_id == farm_id).distinct()
+
+    categories = session.execute(query.order_by(Category.id)).scalars().all()
+    # Farms having products in each category, in or out of stock: the WebApp's farm -> categories navigation
+    farm_ids = {}
+    for category_id, product_farm_id in session.execute(
+        select(product_categories_association.c.category_id, Product.farm_id).distinct()
+        .join(Product, Product.id == product_categories_association.c.product_id)
+        .where(Product.farm_id.isnot(None))
+        .order_by(Product.farm_id)
+    ):
+        farm_ids.setdefault(category_id, []).append(product_farm_id)
+    return [
+        {
+            'id': category.id,
+            'name': category.name,
+            'name_de': category.name_de,
+            'slug': category.slug,
+            'description': category.description,
+            'description_de': category.description_de,
+            'image_path': category.image_path,
+            'image_url': image_url(category.image_path),
+            'image_srcset': image_srcset(category.image_path),
+            'farm_ids': farm_ids.get(category.id, [])
+        }
+        for category in categories
+    ]
+
+# Facet name -> the columns it groups by (region and farm type come through the product's farm)
+_FACET_GROUPS = {
+    'regions': ('region_id',),
+    'farms': ('farm_id',),
+    'farm_types': ('farm_type',),
+    'categories': ('category_id',),
+    'farm_categories': ('farm_id', 'category_id'),
+}
+
+def serialize_facets(session) -> dict:
+    """Return in-stock product counts per region, farm, farm type, category and farm+category in one query."""
+    base = (
+        select(
+            Product.id.label('product_id'),
+            Farm.region_id.label('region_id'),
+            Product.farm_id.label('farm_id'),
+            func.lower(Farm.farm_type).label('farm_type'),
+            product_categories_association.c.category_id.label('category_id'),
+        )
+        .outerjoin(Farm, Product.farm_id == Farm.id)
+        .outerjoin(product_categories_association, product_categories_association.c.product_id == Product.id)
+        .where(Product.availability_status == AvailabilityStatus.IN_STOCK)
+        .subquery()
+    )
+    count = func.count(base.c.product_id.distinct()).label('count')
+    key_columns = [base.c.region_id, base.c.farm_id, base.c.farm_type, base.c.category_id]
+
+    if session.get_bind().dialect.name == 'postgresql':
+        # GROUPING SETS: one scan of the join; GROUPING() tells which set a row belongs to
+        query = select(
+            func.grouping(*key_columns).label('grouping'), *key_columns, count
+        ).group_by(func.grouping_sets(*[
+            tuple_(*[base.c[name] for name in columns]) for columns in _FACET_GROUPS.values()
+        ]))
+        # GROUPING() sets a bit for every column not in the row's group, first column highest
+        names_by_grouping = {}
+        for facet, columns in _FACET_GROUPS.items():
+            bits = sum(1 << (len(key_columns) - 1 - i) for i, column in enumerate(key_columns) if column.name not in columns)
+            names_by_grouping[bits] = facet
+        rows = [(names_by_grouping[row.grouping], row) for row in session.execute(query)]
+    else:
+        # Other dialects (SQLite in scripts): the same groups as one UNION ALL statement
+        parts = []
+        for facet, columns in _FACET_GROUPS.items():
+            parts.append(
+                select(
+                    literal(facet).label('facet'),
+                    *[column if column.name in columns else null().label(column.name) for column in key_columns],
+                    count
+                ).group_by(*[base.c[name] for name in columns])
+            )
+        rows = [(row.facet, row) for row in session.execute(union_all(*parts))]
+
+    facets = {facet: {} for facet in _FACET_GROUPS}
+    for facet, row in rows:
+        keys = [getattr(row, name) for name in _FACET_GROUPS[facet]]
+        if None in keys:
+            # Products without a farm, farm type or category
+            continue
+        # JSON object keys are strings; keep them that way on the Python side too
+        target = facets[facet]
+        for key in keys[:-1]:
+            target = target.setdefault(str(key), {})
+        target[str(keys[-1])] = row.count
+    return facets
+
+# Fields a product dict can carry; `id` is always included so clients can page by it
+PRODUCT_FIELDS = (
+    'id', 'name', 'name_de', 'price', 'unit', 'sku', 'description', 'description_de',
+    'categories', 'categories_de', 'farm_name', 'farm_name_de', 'image_path', 'image_url', 'image_srcset'
+)
+
+_PRODUCT_COLUMNS = {
+    'id': Product.id,
+    'name': Product.name,
+    'name_de': Product.name_de,
+    'price': Product.price,
+    'unit': Product.unit,
+    'sku': Product.sku,
+    'description': Product.description,
+    'description_de': Product.description_de,
+    'image_path': Product.image_path,
+    'farm_name': Farm.name.label('farm_name'),
+    'farm_name_de': Farm.name.label('farm_name'),  # Assuming farm names are the same
+}
+
+# Fields derived from a selected column in Python rather than selected themselves
+_PRODUCT_COMPUTED = {
+    'image_url': ('image_path', image_url),
+    'image_srcset': ('image_path', image_srcset),
+}
+
+def normalize_product_fields(fields=None) -> tuple:
+    """Turn a `fields=` list into a canonical tuple of known product fields (all if empty)."""
+    if not fields:
+        return PRODUCT_FIELDS
+    unknown = set(fields) - set(PRODUCT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown product fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in PRODUCT_FIELDS if field == 'id' or field in fields)
+
+# What the WebApp's product list requests (rendered into its page); only these pages are snapshotted
+PRODUCT_PAGE_SIZE = 24
+PRODUCT_LIST_FIELDS = normalize_product_fields(
+    ['id', 'name', 'name_de', 'price', 'unit', 'description', 'description_de', 'image_url', 'image_srcset']
+)
+
+def _products_filter(category_id=None, farm_id=None):
+    """Build the WHERE clauses shared by the product and product-category queries."""
+    clauses = [Product.availability_status == AvailabilityStatus.IN_STOCK]
+    if category_id:
+        clauses.append(Product.id.in_(
+            select(product_categories_association.c.product_id)
+            .where(product_categories_association.c.category_id == category_id)
+        ))
+    if farm_id:
+        clauses.append(Product.farm_id == farm_id)
+    return clauses
+
+def _serialize_product_rows(session, clauses, fields, limit=None) -> list:
+    """Select only the requested columns, plus category names when asked for (one extra query)."""
+    columns = {}
+    for field in fields:
+        if field in _PRODUCT_COMPUTED:
+            field = _PRODUCT_COMPUTED[field][0]
+        column = _PRODUCT_COLUMNS.get(field)
+        if column is not None:
+            columns[column.key] = column
+
+    # Query 1: product columns with the farm name joined in when needed
+    query = select(*columns.values()).where(*clauses).order_by(Product.id).limit(limit)
+    if 'farm_name' in columns:
+        query = query.outerjoin(Farm, Product.farm_id == Farm.id)
+    product_rows = session.execute(query).all()
+
+    # Query 2: category names for the same set of products
+    categories_by_product = {}
+    if 'categories' in fields or 'categories_de' in fields:
+        product_ids = select(Product.id).where(*clauses).order_by(Product.id).limit(limit)
+        category_rows = session.execute(
+            select(product_categories_association.c.product_id, Category.name, Category.name_de)
+            .join(Category, Category.id == product_categories_association.c.category_id)
+            .where(product_categories_association.c.product_id.in_(product_ids))
+            .order_by(product_categories_association.c.product_id, Category.id)
+        ).all()
+        for product_id, name, name_de in category_rows:
+            names, names_de = categories_by_product.setdefault(product_id, ([], []))
+            names.append(name)
+            names_de.append(name_de)
+
+    products_data = []
+    for row in product_rows:
+        row = row._mapping
+        category_names, category_names_de = categories_by_product.get(row['id'], ([], []))
+        values = {'categories': category_names, 'categories_de': category_names_de}
+        for field, (source, compute) in _PRODUCT_COMPUTED.items():
+            if field in fields:
+                values[field] = compute(row[_PRODUCT_COLUMNS[source].key])
+        products_data.append({
+            field: values[field] if field in values else row[_PRODUCT_COLUMNS[field].key]
+            for field in fields
+        })
+    return products_data
+
+def serialize_products(session, category_id=None, farm_id=None, after_id=None, limit=None, fields=None) -> list:
+    """Return in-stock products as WebApp dicts in at most two queries.
+
+    Pages are keyset-based: pass the last `id` of the previous page as `after_id`.
+    """
+    clauses = _products_filter(category_id, farm_id)
+    if after_id:
+        clauses.append(Product.id > after_id)
+    return _serialize_product_rows(session, clauses, normalize_product_fields(fields), limit)
+
+def serialize_product(session, product_id) -> dict:
+    """Return the full detail dict of one product (any availability), or None."""
+    rows = _serialize_product_rows(session, [Product.id == product_id], PRODUCT_FIELDS)
+    if not rows:
+        return None
+    product = rows[0]
+    status = session.scalar(select(Product.availability_status).where(Product.id == product_id))
+    product['availability_status'] = status.value if status else None
+    return product
@@ -0,0 +1,333 @@
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from functools import lru_cache
+
+from core.utils.catalog import serialize_products, serialize_product
+
+# In-process inverted index for WebApp product search.
+# Tokens from names, descriptions, SKU, farm and category names map to product ids;
+# query tokens are matched as prefixes over the sorted token list.
+# Full rebuilds run in a background thread and are swapped in when done; until then
+# searches are answered from the previous index.
+
+# Field weights; names in the requested language get an extra boost
+FIELD_WEIGHTS = {
+    'name': 4, 'name_de': 4, 'sku': 4,
+    'categories': 2, 'categories_de': 2, 'farm_name': 2,
+    'description': 1, 'description_de': 1,
+}
+LANGS = ('uk', 'de')
+LANG_FIELDS = {'uk': ('name', 'description'), 'de': ('name_de', 'description_de')}
+
+# Fields returned for each hit, the same ones the WebApp product cards use
+RESULT_FIELDS = ('id', 'name', 'name_de', 'price', 'unit', 'description', 'description_de', 'image_path', 'image_url', 'image_srcset')
+
+# Apostrophes inside Ukrainian words (м'ясо, м’ясо, мʼясо) belong to the word
+_TOKEN_RE = re.compile(r"\w+(?:['’ʼ`]\w+)*")
+_APOSTROPHES = str.maketrans('', '', "'’ʼ`")
+# Letters often typed without their diacritics on a foreign keyboard
+_LETTER_FOLDS = str.maketrans({'ґ': 'г', 'ї': 'і', 'ё': 'е'})
+_UMLAUT_DIGRAPHS = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue'})
+
+def _strip_marks(text: str) -> str:
+    """Remove Latin diacritics (ä -> a, é -> e) but keep Cyrillic letters like й intact."""
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize('NFD', text)
+    kept = []
+    for char in decomposed:
+        # Only marks that follow a Latin letter (below U+0250) are dropped
+        if unicodedata.combining(char) and kept and kept[-1] < '\u0250':
+            continue
+        kept.append(char)
+    return unicodedata.normalize('NFC', ''.join(kept))
+
+@lru_cache(maxsize=100000)
+def _token_forms(word: str) -> tuple:
+    """Folded forms of one case-folded word; the base-letter form always comes first."""
+    # Catalog vocabulary is small, so each distinct word is folded only once
+    word = word.translate(_APOSTROPHES).translate(_LETTER_FOLDS)
+    base = _strip_marks(word)
+    digraphs = _strip_marks(word.translate(_UMLAUT_DIGRAPHS))
+    return (base,) if digraphs == base else (base, digraphs)
+
+def tokenize(text: str) -> list:
+    """Split a query into search tokens (case-folded, ß -> ss, umlauts reduced to their base letter)."""
+    return [_token_forms(word)[0] for word in _TOKEN_RE.findall((text or '').casefold())]
+
+def index_tokens(text: str) -> set:
+    """Tokens to index for a field: base-letter form plus the ae/oe/ue spelling of umlauts."""
+    tokens = set()
+    for word in set(_TOKEN_RE.findall((text or '').casefold())):
+        tokens.update(_token_forms(word))
+    return tokens
+
+class CatalogSearchIndex:
+    def __init__(self, max_prefix_tokens: int = 2000):
+        # Cap on how many distinct tokens one very short prefix may expand to
+        self.max_prefix_tokens = max_prefix_tokens
+        self._postings = {}  # token -> {product_id: (weight_uk, weight_de)}
+        self._tokens = []  # sorted list of all tokens, for prefix ranges
+        self._product_tokens = {}  # product_id -> set of tokens, for incremental removal
+        self._documents = {}  # product_id -> result dict
+        # token -> one list per language of (-weight, product_id), kept sorted (best first)
+        self._ranked = {}
+        self._lock = threading.RLock()
+        # Serialises full builds; held only by the first load and the background rebuild
+        self._build_lock = threading.Lock()
+        self._rebuilding = False
+        self.loaded = False
+        self.loaded_generation = None
+        self.queries = 0
+        self.rebuilds = 0
+
+    def __len__(self):
+        return len(self._documents)
+
+    @staticmethod
+    def _weights_by_token(product: dict) -> dict:
+        """Token -> per-language weight of its best field, computed once at index time."""
+        weights_by_token = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            value = product.get(field)
+            if isinstance(value, list):
+                value = ' '.join(v for v in value if v)
+            field_weights = tuple(weight + (field in LANG_FIELDS[lang]) for lang in LANGS)
+            for token in index_tokens(value):
+                current = weights_by_token.get(token)
+                if current is None or field_weights > current:
+                    weights_by_token[token] = field_weights
+        return weights_by_token
+
+    def _add(self, product: dict):
+        weights_by_token = self._weights_by_token(product)
+        product_id = product['id']
+        for token, weights in weights_by_token.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                self._ranked[token] = tuple([] for _ in LANGS)
+                self._tokens.insert(bisect_left(self._tokens, token), token)
+            posting[product_id] = weights
+            for ranked, weight in zip(self._ranked[token], weights):
+                insort(ranked, (-weight, product_id))
+        self._product_tokens[product_id] = tuple(weights_by_token)
+        self._documents[product_id] = {field: product.get(field) for field in RESULT_FIELDS}
+
+    def _remove(self, product_id: int):
+        for token in self._product_tokens.pop(product_id, ()):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            weights = posting.pop(product_id, None)
+            if weights is None:
+                continue
+            for ranked, weight in zip(self._ranked[token], weights):
+                position = bisect_left(ranked, (-weight, product_id))
+                if position < len(ranked) and ranked[position] == (-weight, product_id):
+                    del ranked[position]
+            if not posting:
+                del self._postings[token]
+                del self._ranked[token]
+                position = bisect_left(self._tokens, token)
+                if position < len(self._tokens) and self._tokens[position] == token:
+                    del self._tokens[position]
+        self._documents.pop(product_id, None)
+
+    def build(self, products, generation=None):
+        """Replace the whole index with the given product dicts.
+
+        The new index is built aside and swapped in at the end, so searches are not blocked meanwhile.
+        """
+        postings, product_tokens, documents = {}, {}, {}
+        for product in products:
+            # Bulk path: fill postings unsorted, sort the token list once at the end
+            weights_by_token = self._weights_by_token(product)
+            for token, weights in weights_by_token.items():
+                postings.setdefault(token, {})[product['id']] = weights
+            product_tokens[product['id']] = tuple(weights_by_token)
+            documents[product['id']] = {field: product.get(field) for field in RESULT_FIELDS}
+        tokens = sorted(postings)
+        # Rank every word's products once, so queries only read the heads of these lists
+        ranked = {
+            token: tuple(
+                sorted((-weights[lang_index], pid) for pid, weights in posting.items())
+                for lang_index in range(len(LANGS))
+            )
+            for token, posting in postings.items()
+        }
+        with self._lock:
+            self._postings, self._tokens, self._product_tokens, self._documents = postings, tokens, product_tokens, documents
+            self._ranked = ranked
+            self.loaded = True
+            self.loaded_generation = generation
+
+    def load(self, session, generation=None):
+        """Index every in-stock product (two queries)."""
+        self.build(serialize_products(session), generation)
+
+    def upsert(self, product: dict):
+        """Re-index one product; a product that is no longer in stock is removed."""
+        with self._lock:
+            self._remove(product['id'])
+            if product.get('availability_status', 'IN_STOCK') == 'IN_STOCK':
+                self._add(product)
+
+    def remove(self, product_id: int):
+        with self._lock:
+            self._remove(product_id)
+
+    def apply_product_delete(self, product_id: int, before, after):
+        """Drop one deleted product and move the index from generation `before` to `after`."""
+        with self._lock:
+            if not self.loaded or self.loaded_generation != before:
+                return
+            self.remove(product_id)
+            self.loaded_generation = after
+
+    def _rebuild(self, generation, load):
+        with self._build_lock:
+            if self.loaded and self.loaded_generation == generation:
+                return
+            try:
+                load(self, generation)
+                self.rebuilds += 1
+            except Exception as e:
+                print(f"Error rebuilding the catalog search index: {e}")
+            finally:
+                self._rebuilding = False
+
+    def ensure_current(self, generation, load):
+        """Make sure `load(index, generation)` runs for this catalog generation.
+
+        Only the very first load happens in the caller; later rebuilds run in a background thread
+        while the previous index keeps answering (results may be stale for the rebuild's duration).
+        """
+        with self._lock:
+            if self.loaded and self.loaded_generation == generation:
+                return
+            if self.loaded:
+                if not self._rebuilding:
+                    self._rebuilding = True
+                    threading.Thread(
+                        target=self._rebuild, args=(generation, load), name='catalog-search-rebuild', daemon=True
+                    ).start()
+                return
+        # Nothing to serve yet: concurrent first searches wait for one shared build
+        self._rebuild(generation, load)
+
+    def apply_product_change(self, session, product_id: int, before, after):
+        """Re-index one edited product and move the index from generation `before` to `after`.
+
+        If the index was not current before the edit it is left stale and rebuilt on next use.
+        """
+        if not self.loaded or self.loaded_generation != before:
+            return
+        # Read before taking the lock, so searches never wait on the database; the generation
+        # check below still drops the change if a rebuild swapped the index in the meantime
+        product = serialize_product(session, product_id)
+        with self._lock:
+            if not self.loaded or self.loaded_generation != before:
+                return
+            if product is None:
+                self._remove(product_id)
+            else:
+                self.upsert(product)
+            self.loaded_generation = after
+
+    def _candidates(self, token: str) -> list:
+        """Indexed tokens starting with `token`, capped at `max_prefix_tokens`."""
+        start = bisect_left(self._tokens, token)
+        end = bisect_left(self._tokens, token + '\U0010ffff', start, min(start + self.max_prefix_tokens, len(self._tokens)))
+        return self._tokens[start:end]
+
+    def _stream(self, token: str, candidates: list, lang_index: int):
+        """Yield (-weight, product_id) for every product matching `token`, best first, each product once."""
+        streams = []
+        for candidate in candidates:
+            ranked = self._ranked[candidate][lang_index]
+            if candidate == token:
+                # Exact word matches count double
+                ranked = ((weight * 2, pid) for weight, pid in ranked)
+            streams.append(ranked)
+
+        seen = set()
+        for weight, pid in heapq.merge(*streams):
+            if pid not in seen:
+                seen.add(pid)
+                yield weight, pid
+
+    def _weight_lookup(self, token: str, candidates: list, lang_index: int):
+        """Return a function product_id -> best weight for `token` (0 if the product does not match)."""
+        if len(candidates) > 8:
+            # Short prefix with many words: scan the product's own few tokens instead
+            product_tokens, postings = self._product_tokens, self._postings
+
+            def lookup_by_product(pid):
+                return max(
+                    (postings[t][pid][lang_index] * (2 if t == token else 1)
+                     for t in product_tokens[pid] if t.startswith(token)),
+                    default=0
+                )
+            return lookup_by_product
+
+        postings = [(self._postings[c], 2 if c == token else 1) for c in candidates]
+        missing = (0, 0)
+
+        def lookup(pid):
+            return max(posting.get(pid, missing)[lang_index] * exact for posting, exact in postings)
+        return lookup
+
+    def _max_weight(self, token: str, candidates: list, lang_index: int) -> int:
+        return max(-self._ranked[c][lang_index][0][0] * (2 if c == token else 1) for c in candidates)
+
+    def search(self, query: str, lang: str = 'uk', limit: int = 20) -> list:
+        """Return up to `limit` product dicts matching every query token (as a prefix), best first."""
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+        self.queries += 1
+        lang_index = LANGS.index(lang) if lang in LANGS else 0
+
+        with self._lock:
+            planned = []
+            for token in tokens:
+                candidates = self._candidates(token)
+                if not candidates:
+                    return []
+                planned.append((sum(len(self._postings[c]) for c in candidates), token, candidates))
+            # The most selective word drives the walk, the others are looked up per product
+            planned.sort(key=lambda item: item[0])
+            _, token, candidates = planned[0]
+            others = [self._weight_lookup(t, c, lang_index) for _, t, c in planned[1:]]
+            others_max = sum(self._max_weight(t, c, lang_index) for _, t, c in planned[1:])
+
+            top = []  # min-heap of (score, -product_id) holding the best `limit` hits
+            for weight, pid in self._stream(token, candidates, lang_index):
+                # Products come in falling driver weight: stop once none can beat the current top
+                # (equal scores keep the hits found first)
+                if len(top) == limit and -weight + others_max <= top[0][0]:
+                    break
+                score = -weight
+                for lookup in others:
+                    other = lookup(pid)
+                    if not other:
+                        break
+                    score += other
+                else:
+                    if len(top) < limit:
+                        heapq.heappush(top, (score, -pid))
+                    elif (score, -pid) > top[0]:
+                        heapq.heapreplace(top, (score, -pid))
+
+            top.sort(reverse=True)
+            return [dict(self._documents[-negative_pid]) for _, negative_pid in top]
+
+    def stats(self) -> dict:
+        return {'products': len(self._documents), 'tokens': len(self._tokens), 'queries': self.queries, 'rebuilds': self.rebuilds}
+
+catalog_search = CatalogSearchIndex()
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Precomputed, fully serialized catalog responses.
+# Each (section, filter params) combination is serialized to JSON bytes once and served
+# from memory until an admin change invalidates the section it depends on.
+# Params come from requests, so the number of entries is capped (least recently used go first).
+
+SECTIONS = ('translations', 'regions', 'farms', 'categories', 'products', 'facets', 'bootstrap')
+
+# Which sections must be rebuilt when a model changes
+SECTIONS_BY_MODEL = {
+    'Region': ('regions', 'farms'),
+    'Farm': ('farms', 'categories', 'products', 'facets'),
+    'Category': ('categories', 'products', 'facets'),
+    'Product': ('products', 'categories', 'facets'),
+    'Translation': ('translations',),
+}
+
+# Sections whose payload is stitched together from other sections' bytes;
+# they are dropped whenever one of their parts is
+COMPOSED_SECTIONS = {
+    'bootstrap': ('translations', 'regions', 'farms', 'categories', 'facets'),
+}
+
+class SnapshotEntry:
+    def __init__(self, body: bytes):
+        self.body = body
+        # Strong validator derived from the payload itself, identical across processes
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+
+class CatalogSnapshot:
+    def __init__(self, cache_dir: str = None, max_entries: int = 512):
+        # Directory shared by all workers: blobs are persisted there and per-section stamp
+        # files tell other processes to drop their memory copies (without one, invalidation
+        # only reaches the current process)
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        # Blobs older than this process may come from a previous deploy or a database changed behind its back
+        self._started_ns = time.time_ns()
+        self._entries = OrderedDict()  # (section, params) -> SnapshotEntry, least recently used first
+        self._seen_stamps = {}
+        # Bumped on every invalidation, so a build that raced with one is not stored
+        self._generations = {section: 0 for section in SECTIONS}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(section: str, params: dict):
+        return section, tuple(sorted((k, v) for k, v in params.items() if v not in (None, '')))
+
+    def _blob_path(self, key):
+        section, params = key
+        name = hashlib.sha1(repr(params).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, section, f"{name}.json")
+
+    def _stamp_path(self, section: str):
+        return os.path.join(self.cache_dir, f"{section}.stamp")
+
+    def _stamp(self, section: str):
+        try:
+            return os.stat(self._stamp_path(section)).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _sync_section(self, section: str):
+        """Drop memory entries of a section another process has invalidated."""
+        stamp = self._stamp(section)
+        if self._seen_stamps.get(section) != stamp:
+            with self._lock:
+                self._generations[section] = self._generations.get(section, 0) + 1
+                for key in [k for k in self._entries if k[0] == section]:
+                    del self._entries[key]
+                self._seen_stamps[section] = stamp
+
+    @staticmethod
+    def _dumps(data) -> bytes:
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def get(self, section: str, params: dict, build, cache: bool = True) -> SnapshotEntry:
+        """Return the serialized entry for a section and filters, building it on first use.
+
+        With `cache=False` the entry is built for this call only (one-off filter combinations).
+        """
+        if not cache:
+            return SnapshotEntry(self._dumps(build()))
+        return self._get(section, params, lambda: self._dumps(build()))
+
+    def compose(self, section: str, params: dict, parts: dict) -> SnapshotEntry:
+        """Return one JSON object made of other sections' cached payloads.
+
+        `parts` maps an output field to a (section, params, build) triple; each part is
+        served from (or stored into) its own section, so its bytes are reused as they are.
+        """
+        def make_body():
+            fields = []
+            for name, (part_section, part_params, build) in parts.items():
+                entry = self.get(part_section, part_params, build)
+                fields.append(self._dumps(name) + b':' + entry.body)
+            return b'{' + b','.join(fields) + b'}'
+        return self._get(section, params, make_body)
+
+    def _get(self, section: str, params: dict, make_body) -> SnapshotEntry:
+        key = self._key(section, params)
+        if self.cache_dir:
+            self._sync_section(section)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        generation = self._generations.get(section, 0)
+        body = None
+        if self.cache_dir:
+            try:
+                with open(self._blob_path(key), 'rb') as f:
+                    if os.fstat(f.fileno()).st_mtime_ns >= self._started_ns:
+                        body = f.read()
+            except OSError:
+                body = None
+
+        built = body is None
+        if built:
+            body = make_body()
+            self.builds += 1
+
+        entry = SnapshotEntry(body)
+        evicted = []
+        with self._lock:
+            current = self._generations.get(section, 0) == generation
+            if current:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    evicted.append(self._entries.popitem(last=False)[0])
+        self.evictions += len(evicted)
+        if built and current and self.cache_dir:
+            self._write_blob(key, body)
+        if self.cache_dir:
+            # Keeps the shared directory bounded too; other workers simply rebuild
+            for evicted_key in evicted:
+                try:
+                    os.remove(self._blob_path(evicted_key))
+                except OSError:
+                    pass
+        return entry
+
+    def _write_blob(self, key, body: bytes):
+        path = self._blob_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Catalog snapshot write error for {path}: {e}")
+
+    def invalidate(self, *sections):
+        """Drop the given sections (all of them if none given); they are rebuilt on next read."""
+        sections = set(sections or SECTIONS)
+        sections.update(name for name, parts in COMPOSED_SECTIONS.items() if sections.intersection(parts))
+        with self._lock:
+            for section in sections:
+                self._generations[section] = self._generations.get(section, 0) + 1
+            for key in [k for k in self._entries if k[0] in sections]:
+                del self._entries[key]
+        if self.cache_dir:
+            for section in sections:
+                section_dir = os.path.join(self.cache_dir, section)
+                if os.path.isdir(section_dir):
+                    for name in os.listdir(section_dir):
+                        try:
+                            os.remove(os.path.join(section_dir, name))
+                        except OSError:
+                            pass
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(self._stamp_path(section), 'a'):
+                    os.utime(self._stamp_path(section))
+                self._seen_stamps[section] = self._stamp(section)
+
+    def invalidate_for_model(self, model_class):
+        """Invalidate only the sections that depend on the changed model."""
+        sections = SECTIONS_BY_MODEL.get(model_class.__name__)
+        if sections:
+            self.invalidate(*sections)
+
+    def generation(self, section: str) -> int:
+        """Counter that changes whenever the section is invalidated, in this or another process."""
+        if self.cache_dir:
+            self._sync_section(section)
+        return self._generations.get(section, 0)
+
+    def stats(self) -> dict:
+        return {'entries': len(self._entries), 'builds': self.builds, 'hits': self.hits, 'evictions': self.evictions}
+
+# Defaults to a directory inside the instance folder, so every worker of a checkout shares it
+DEFAULT_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'instance', 'catalog_snapshot'))
+
+catalog_snapshot = CatalogSnapshot(
+    cache_dir=os.getenv("CATALOG_SNAPSHOT_DIR") or DEFAULT_CACHE_DIR,
+    max_entries=int(os.getenv("CATALOG_SNAPSHOT_MAX_ENTRIES", "512"))
+)
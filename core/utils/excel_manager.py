@@ -1,8 +1,14 @@
 import pandas as pd
+import json
 import os
-from sqlalchemy import select
+import zipfile
+from openpyxl import Workbook
+from sqlalchemy import select, delete, update, func, insert, text, table, column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload, selectinload
 from core.database import async_session
-from core.models import Product, Category, Farm, AvailabilityStatus
+from core.models import Product, Category, Farm, AvailabilityStatus, CartItem, OrderItem, product_categories_association
 
 def safe_encode_for_sql_ascii(value):
     """Handle SQL_ASCII encoding to prevent mojibake in Excel export."""
@@ -15,157 +21,565 @@ def safe_encode_for_sql_ascii(value):
             return value
     return value
 
+# Column order of exported sheets; the importer reads the same headers back
+EXPORT_COLUMNS = (
+    'id', 'name', 'name_de', 'price', 'unit', 'sku', 'availability_status',
+    'description', 'description_de', 'category_names', 'farm_name', 'image_path'
+)
+EXPORT_BATCH_SIZE = 1000
+
+def _export_row(p) -> list:
+    return [
+        p.id,
+        safe_encode_for_sql_ascii(p.name),
+        safe_encode_for_sql_ascii(p.name_de),
+        p.price,
+        p.unit,
+        p.sku,
+        p.availability_status.value if p.availability_status else None,
+        safe_encode_for_sql_ascii(p.description),
+        safe_encode_for_sql_ascii(p.description_de),
+        safe_encode_for_sql_ascii(", ".join([c.name for c in p.categories])) if p.categories else None,
+        safe_encode_for_sql_ascii(p.farm.name) if p.farm else None,
+        p.image_path
+    ]
+
 # Sync versions for Flask-Admin
-def export_products_to_excel_sync(db_session, file_path: str, query=None, products=None):
-    """Sync version for Flask-Admin: Export products to an Excel file."""
-    if products is None:
-        if query is None:
-            query = select(Product)
-        result = db_session.execute(query)
-        products = result.scalars().all()
+def iter_products_for_export(db_session, query=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield products in the query's order, loading them batch by batch with farm and categories eager-loaded."""
+    if query is None:
+        query = select(Product).order_by(Product.id)
+    # Only ids come through the (server-side) cursor; the query's own loader options do not apply to them
+    ids = db_session.scalars(query.with_only_columns(Product.id).execution_options(yield_per=batch_size))
+    for batch in ids.partitions():
+        products = db_session.scalars(
+            select(Product)
+            .where(Product.id.in_(batch))
+            .options(joinedload(Product.farm), selectinload(Product.categories))
+        ).all()
+        by_id = {product.id: product for product in products}
+        for product_id in batch:
+            yield by_id[product_id]
+
+def export_products_to_excel_sync(db_session, file_path: str, query=None, batch_size=EXPORT_BATCH_SIZE, progress=None):
+    """Sync version for Flask-Admin: Export products to an Excel file with constant memory.
+
+    `progress(done, total)` is called after every batch; it may raise to abort the export.
+    """
+    if query is None:
+        query = select(Product).order_by(Product.id)
+    total = None
+    if progress:
+        total = db_session.scalar(select(func.count()).select_from(query.with_only_columns(Product.id).subquery()))
+        progress(0, total)
+    # Write-only workbook: rows go straight to disk instead of a DataFrame or an in-memory sheet
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(EXPORT_COLUMNS)
+    count = 0
+    try:
+        for product in iter_products_for_export(db_session, query, batch_size):
+            sheet.append(_export_row(product))
+            count += 1
+            if progress and count % batch_size == 0:
+                progress(count, total)
+    except Exception:
+        # Finish the sheet's temporary XML file so openpyxl can clean it up
+        sheet.close()
+        raise
+    workbook.save(file_path)
+    if progress:
+        progress(count, total)
+    return f"Exported {count} products to {file_path}"
+
+# Sheet columns read as trimmed text; blank cells become missing values
+IMPORT_TEXT_COLUMNS = (
+    'name', 'name_de', 'unit', 'sku', 'availability_status', 'description', 'description_de',
+    'category_names', 'farm_name', 'image_path'
+)
+# Updated only when the sheet has a value; name, price, unit and sku are always overwritten
+IMPORT_OPTIONAL_COLUMNS = ('name_de', 'description', 'description_de', 'image_path', 'availability_status', 'farm_id')
+IMPORT_OVERWRITTEN_COLUMNS = ('name', 'price', 'unit', 'sku')
+IMPORT_CHUNK_SIZE = 500
+
+# INSERT ... ON CONFLICT for the supported dialects (PostgreSQL in production, SQLite in scripts)
+_DIALECT_INSERTS = {'postgresql': pg_insert, 'sqlite': sqlite_insert}
+
+def _text_column(series: pd.Series) -> pd.Series:
+    # Numeric SKUs come back as floats when the column has blanks: keep "123", not "123.0"
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype('Int64')
+    series = series.astype('string').str.strip()
+    return series.mask(series == '')
+
+def normalize_products_sheet(df: pd.DataFrame) -> pd.DataFrame:
+    """Validate and clean a products sheet column by column; returns one row per sheet row with an `error` column."""
+    df = df.reset_index(drop=True).reindex(columns=EXPORT_COLUMNS)
+    sheet = pd.DataFrame({'row_num': df.index + 2})  # Assuming header is row 1
+    for column in IMPORT_TEXT_COLUMNS:
+        sheet[column] = _text_column(df[column])
+
+    ids = pd.to_numeric(df['id'], errors='coerce')
+    bad_id = df['id'].notna() & (ids.isna() | (ids % 1 != 0))
+    sheet['id'] = ids.where(~bad_id).astype('Int64')
+    prices = pd.to_numeric(df['price'], errors='coerce')
+    bad_price = df['price'].notna() & prices.isna()
+    sheet['price'] = prices.fillna(0.0)
+    bad_unit = df['unit'].notna() & sheet['unit'].isna()
+    sheet['unit'] = sheet['unit'].fillna('kg')
+    statuses = sheet['availability_status']
+    bad_status = statuses.notna() & ~statuses.isin([status.value for status in AvailabilityStatus])
+
+    # First failing check wins, like the row-by-row validation did
+    checks = [
+        (bad_id, "ID must be a whole number"),
+        (sheet['name'].isna(), "Name cannot be empty"),
+        (bad_price, "Price must be a number"),
+        (sheet['price'] < 0, "Price cannot be negative"),
+        (bad_unit, "Unit cannot be empty"),
+        (sheet['sku'].str.len() > 50, "SKU cannot be longer than 50 characters"),
+        (bad_status, "'" + statuses + "' is not a valid AvailabilityStatus"),
+    ]
+    error = pd.Series(pd.NA, index=sheet.index, dtype='string')
+    for mask, message in reversed(checks):
+        error = error.mask(mask.fillna(False).astype(bool), message)
+    sheet['skipped'] = df['id'].isna() & df['sku'].isna() & df['name'].isna()
+    sheet['error'] = error.mask(sheet['skipped'])
+    return sheet
+
+def match_products_sheet(db_session, sheet: pd.DataFrame) -> pd.DataFrame:
+    """Resolve sheet rows to existing products (by id, then SKU), farms and categories with three queries."""
+    existing = pd.DataFrame(db_session.execute(select(Product.id, Product.sku)).all(), columns=['id', 'sku'])
+    id_by_sku = existing.dropna(subset=['sku']).set_index('sku')['id']
+    by_id = sheet['id'].where(sheet['id'].isin(existing['id']))
+    sheet['product_id'] = by_id.fillna(sheet['sku'].map(id_by_sku)).astype('Int64')
+
+    # Names are not unique in the schema: the oldest row wins
+    farm_ids = {}
+    for name, farm_id in db_session.execute(select(Farm.name, Farm.id).order_by(Farm.id)):
+        farm_ids.setdefault(name, farm_id)
+    sheet['farm_id'] = sheet['farm_name'].map(farm_ids).astype('Int64')
+    category_ids = {}
+    for name, category_id in db_session.execute(select(Category.name, Category.id).order_by(Category.id)):
+        category_ids.setdefault(name, category_id)
+    sheet.attrs['category_ids'] = category_ids
+
+    valid = ~sheet['skipped'] & sheet['error'].isna()
+    # A SKU repeated among new rows creates the product once, later rows update it
+    repeated = sheet['product_id'].isna() & sheet['sku'].notna() & sheet.duplicated('sku') & valid
+    sheet['action'] = 'create'
+    sheet.loc[sheet['product_id'].notna() | repeated, 'action'] = 'update'
+    sheet.loc[~valid, 'action'] = 'error'
+    sheet.loc[sheet['skipped'], 'action'] = 'skip'
+    return sheet
 
-    data = []
-    for p in products:
-        data.append({
-            'id': p.id,
-            'name': safe_encode_for_sql_ascii(p.name),
-            'name_de': safe_encode_for_sql_ascii(p.name_de),
-            'price': p.price,
-            'unit': p.unit,
-            'sku': p.sku,
-            'availability_status': p.availability_status.value if p.availability_status else None,
-            'description': safe_encode_for_sql_ascii(p.description),
-            'description_de': safe_encode_for_sql_ascii(p.description_de),
-            'category_names': safe_encode_for_sql_ascii(", ".join([c.name for c in p.categories])) if p.categories else None,
-            'farm_name': safe_encode_for_sql_ascii(p.farm.name) if p.farm else None,
-            'image_path': p.image_path
-        })
-
-    df = pd.DataFrame(data)
-    df.to_excel(file_path, index=False)
-    return f"Exported {len(products)} products to {file_path}"
-
-def import_products_from_excel_sync(db_session, file_path: str):
-    """Sync version for Flask-Admin: Import products with atomic transactions."""
+def _category_pairs(rows: pd.DataFrame, category_ids: dict) -> list:
+    names = rows['category_names'].str.split(',').explode().str.strip()
+    ids = names.map(category_ids).dropna().astype(int)
+    pairs = pd.DataFrame({'product_id': rows.loc[ids.index, 'product_id'].astype(int).values, 'category_id': ids.values})
+    return pairs.drop_duplicates().to_dict('records')
+
+def _product_values(rows: pd.DataFrame) -> list:
+    values = rows[['product_id', 'name', 'name_de', 'price', 'unit', 'sku', 'description', 'description_de', 'image_path', 'farm_id']]
+    values = values.rename(columns={'product_id': 'id'})
+    values = values.astype(object).where(values.notna(), None)
+    records = values.to_dict('records')
+    for record, status in zip(records, rows['availability_status']):
+        record['availability_status'] = AvailabilityStatus(status) if isinstance(status, str) else None
+    return records
+
+def _merge_rows(rows: pd.DataFrame, key: str) -> pd.DataFrame:
+    # Several rows for one product behave like consecutive updates: optional columns keep the
+    # last non-empty value, the always-overwritten ones take the last row's value even if empty
+    merged = rows.groupby(key, sort=False).last()
+    last = rows.drop_duplicates(key, keep='last').set_index(key)
+    for column in IMPORT_OVERWRITTEN_COLUMNS:
+        if column != key:
+            merged[column] = last[column]
+    return merged.reset_index()
+
+def _merge_sheet_rows(sheet: pd.DataFrame):
+    """Split valid rows into (updates of existing products, new products), one row per product."""
+    rows = sheet[sheet['action'].isin(['create', 'update'])]
+    updates = _merge_rows(rows[rows['product_id'].notna()], 'product_id')
+    new_rows = rows[rows['product_id'].isna()]
+    creates = pd.concat([
+        _merge_rows(new_rows[new_rows['sku'].notna()], 'sku'),
+        new_rows[new_rows['sku'].isna()],
+    ], ignore_index=True)
+    return updates, creates
+
+# Import snapshots: both product tables as they were right before an import, COPY'd into one
+# compressed file per import job, plus a manifest of the products the import touched and a digest
+# of what it wrote to each. Restoring one undoes exactly that import instead of reloading a full
+# database dump, and is refused once any of those products has been changed again.
+SNAPSHOT_TABLES = (Product.__table__, product_categories_association)
+
+def _id_chunks(ids: list):
+    for i in range(0, len(ids), IMPORT_CHUNK_SIZE):
+        yield ids[i:i + IMPORT_CHUNK_SIZE]
+
+def _lock_snapshot_tables(db_session):
+    # Writers wait until the transaction commits
+    db_session.execute(text(f"LOCK TABLE {', '.join(t.name for t in SNAPSHOT_TABLES)} IN SHARE ROW EXCLUSIVE MODE"))
+
+def _product_digests(db_session, product_ids: list, names: list) -> dict:
+    # md5 of a product's columns plus its sorted category ids, keyed by product id
+    products, links = SNAPSHOT_TABLES
+    row = ', '.join(f"p.{name}" for name in names)
+    categories = (
+        f"SELECT string_agg(l.category_id::text, ',' ORDER BY l.category_id) "
+        f"FROM {links.name} l WHERE l.product_id = p.id"
+    )
+    digests = {}
+    for chunk in _id_chunks(product_ids):
+        digests.update(db_session.execute(
+            text(f"SELECT p.id, md5(ROW({row})::text || ':' || coalesce(({categories}), '')) "
+                 f"FROM {products.name} p WHERE p.id = ANY(:ids)"),
+            {'ids': chunk}
+        ).all())
+    return digests
+
+def snapshots_supported(bind) -> bool:
+    """Import snapshots and their rollback use COPY, so they need PostgreSQL."""
+    return bind.dialect.name == 'postgresql'
+
+def snapshot_product_tables(db_session, file_path: str) -> bool:
+    """COPY the product tables into a zip inside the session's transaction; False if the database can't COPY."""
+    if not snapshots_supported(db_session.get_bind()):
+        print("Skipping import snapshot: COPY needs PostgreSQL")
+        return False
+    # Writers wait until the import commits, so the snapshot is exactly what the import replaced
+    _lock_snapshot_tables(db_session)
+    cursor = db_session.connection().connection.cursor()
+    try:
+        with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED) as snapshot:
+            for snapshot_table in SNAPSHOT_TABLES:
+                columns = ', '.join(c.name for c in snapshot_table.columns)
+                with snapshot.open(f"{snapshot_table.name}.copy", 'w') as f:
+                    cursor.copy_expert(f"COPY {snapshot_table.name} ({columns}) TO STDOUT", f)
+    finally:
+        cursor.close()
+    return True
+
+def _write_snapshot_manifest(db_session, file_path: str, updated_ids: list, created_ids: list):
+    columns = {t.name: [c.name for c in t.columns] for t in SNAPSHOT_TABLES}
+    digests = _product_digests(db_session, updated_ids + created_ids, columns[Product.__table__.name])
+    manifest = {
+        'columns': columns,
+        'updated': updated_ids,
+        'created': created_ids,
+        'digests': {str(product_id): digest for product_id, digest in digests.items()},
+    }
+    with zipfile.ZipFile(file_path, 'a', zipfile.ZIP_DEFLATED) as snapshot:
+        snapshot.writestr('manifest.json', json.dumps(manifest))
+
+def restore_products_snapshot(db_session, file_path: str, progress=None) -> str:
+    """Undo one import from its snapshot: its new products are deleted, updated ones get their old rows and categories back."""
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File {file_path} not found")
+    if not snapshots_supported(db_session.get_bind()):
+        raise ValueError("Import rollback needs PostgreSQL")
 
-    df = pd.read_excel(file_path)
+    products, links = SNAPSHOT_TABLES
+    with zipfile.ZipFile(file_path) as snapshot:
+        manifest = json.loads(snapshot.read('manifest.json'))
+        updated, created = manifest['updated'], manifest['created']
+        total = len(updated) + len(created)
+        try:
+            # No writes between this check and the restore
+            _lock_snapshot_tables(db_session)
+            names = [name for name in manifest['columns'][products.name] if name in products.c]
+            current = _product_digests(db_session, updated + created, names)
+            changed = sorted(
+                int(product_id) for product_id, digest in manifest.get('digests', {}).items()
+                if current.get(int(product_id)) != digest
+            )
+            if changed:
+                raise ValueError(
+                    f"Products {', '.join(map(str, changed))} were changed after this import; "
+                    "restoring it would overwrite those changes"
+                )
+            in_use = sorted({
+                product_id
+                for chunk in _id_chunks(created)
+                for product_id in db_session.scalars(
+                    select(CartItem.product_id).where(CartItem.product_id.in_(chunk))
+                    .union(select(OrderItem.product_id).where(OrderItem.product_id.in_(chunk)))
+                )
+            })
+            if in_use:
+                raise ValueError(f"Products {', '.join(map(str, in_use))} were created by this import and are already in carts or orders")
+            if progress:
+                progress(0, total)
 
-    report = []
-    success_count = 0
+            # The snapshot goes into temporary tables first, then only the touched products are copied back
+            snapshots = {}
+            cursor = db_session.connection().connection.cursor()
+            try:
+                for snapshot_table in SNAPSHOT_TABLES:
+                    # Built from the snapshot's own columns: ones added later (even NOT NULL without a default)
+                    # keep their current values, ones dropped since are loaded as text and ignored
+                    copied = manifest['columns'][snapshot_table.name]
+                    names = [name for name in copied if name in snapshot_table.c]
+                    cursor.execute(
+                        f"CREATE TEMP TABLE snapshot_{snapshot_table.name} ON COMMIT DROP AS "
+                        f"SELECT {', '.join(names)} FROM {snapshot_table.name} WITH NO DATA"
+                    )
+                    for name in copied:
+                        if name not in snapshot_table.c:
+                            cursor.execute(f"ALTER TABLE snapshot_{snapshot_table.name} ADD COLUMN {name} text")
+                    with snapshot.open(f"{snapshot_table.name}.copy") as f:
+                        cursor.copy_expert(f"COPY snapshot_{snapshot_table.name} ({', '.join(copied)}) FROM STDIN", f)
+                    snapshots[snapshot_table.name] = (table(f"snapshot_{snapshot_table.name}", *map(column, names)), names)
+            finally:
+                cursor.close()
 
-    # Use nested transaction for atomicity
-    with db_session.begin_nested():
-        try:
-            for index, row in df.iterrows():
-                row_num = index + 2  # Assuming header is row 1
-                product_id = row.get('id')
-                sku = row.get('sku')
-                name = row.get('name')
-
-                # Skip invalid rows
-                if pd.isna(product_id) and pd.isna(sku) and pd.isna(name):
-                    report.append(f"Row {row_num}: Skipped - no ID, SKU, or Name")
-                    continue
-
-                # Find existing product: by id first, then by sku
-                existing_product = None
-                if not pd.isna(product_id):
-                    existing_product = db_session.execute(select(Product).where(Product.id == int(product_id))).scalar_one_or_none()
-                if not existing_product and not pd.isna(sku):
-                    existing_product = db_session.execute(select(Product).where(Product.sku == str(sku))).scalar_one_or_none()
-
-                try:
-                    # Validation
-                    name_val = str(row.get('name')).strip() if not pd.isna(row.get('name')) else None
-                    if not name_val:
-                        raise ValueError("Name cannot be empty")
-                    price_val = float(row.get('price')) if not pd.isna(row.get('price')) else 0.0
-                    if price_val < 0:
-                        raise ValueError("Price cannot be negative")
-                    unit_val = str(row.get('unit')).strip() if not pd.isna(row.get('unit')) else 'kg'
-                    if not unit_val:
-                        raise ValueError("Unit cannot be empty")
-                    sku_val = str(row.get('sku')).strip() if not pd.isna(row.get('sku')) else None
-                    if sku_val and len(sku_val) > 50:
-                        raise ValueError("SKU cannot be longer than 50 characters")
-
-                    if existing_product:
-                        # Update existing
-                        existing_product.name = name_val
-                        if not pd.isna(row.get('name_de')):
-                            existing_product.name_de = str(row.get('name_de')).strip()
-                        existing_product.price = price_val
-                        existing_product.unit = unit_val
-                        existing_product.sku = sku_val
-                        if not pd.isna(row.get('description')):
-                            existing_product.description = str(row.get('description')).strip()
-                        if not pd.isna(row.get('description_de')):
-                            existing_product.description_de = str(row.get('description_de')).strip()
-                        if not pd.isna(row.get('image_path')):
-                            existing_product.image_path = str(row.get('image_path')).strip()
-                        if not pd.isna(row.get('availability_status')):
-                            existing_product.availability_status = AvailabilityStatus(str(row.get('availability_status')))
-                        # Link relationships by name (multiple categories)
-                        if not pd.isna(row.get('category_names')):
-                            category_names = [name.strip() for name in str(row.get('category_names')).split(',') if name.strip()]
-                            categories = []
-                            for cat_name in category_names:
-                                category = db_session.execute(select(Category).where(Category.name == cat_name)).scalar_one_or_none()
-                                if category:
-                                    categories.append(category)
-                            existing_product.categories = categories
-                        if not pd.isna(row.get('farm_name')):
-                            farm = db_session.execute(select(Farm).where(Farm.name == str(row.get('farm_name')))).scalar_one_or_none()
-                            if farm:
-                                existing_product.farm_id = farm.id
-                        report.append(f"Row {row_num}: Updated product {existing_product.name}")
-                    else:
-                        # Create new
-                        new_product = Product(
-                            name=name_val,
-                            name_de=str(row.get('name_de')).strip() if not pd.isna(row.get('name_de')) else None,
-                            price=price_val,
-                            unit=unit_val,
-                            sku=sku_val,
-                            description=str(row.get('description')).strip() if not pd.isna(row.get('description')) else None,
-                            description_de=str(row.get('description_de')).strip() if not pd.isna(row.get('description_de')) else None,
-                            image_path=str(row.get('image_path')).strip() if not pd.isna(row.get('image_path')) else None
-                        )
-                        # Set availability_status if provided
-                        if not pd.isna(row.get('availability_status')):
-                            new_product.availability_status = AvailabilityStatus(str(row.get('availability_status')))
-                        # Link relationships by name (multiple categories)
-                        if not pd.isna(row.get('category_names')):
-                            category_names = [name.strip() for name in str(row.get('category_names')).split(',') if name.strip()]
-                            categories = []
-                            for cat_name in category_names:
-                                category = db_session.execute(select(Category).where(Category.name == cat_name)).scalar_one_or_none()
-                                if category:
-                                    categories.append(category)
-                            new_product.categories = categories
-                        if not pd.isna(row.get('farm_name')):
-                            farm = db_session.execute(select(Farm).where(Farm.name == str(row.get('farm_name')))).scalar_one_or_none()
-                            if farm:
-                                new_product.farm_id = farm.id
-                        db_session.add(new_product)
-                        report.append(f"Row {row_num}: Created new product {name}")
-                    success_count += 1
-                except Exception as e:
-                    report.append(f"Row {row_num}: Error - {str(e)}")
-                    raise  # Rollback the nested transaction
-
-            # If no errors, commit the nested transaction
+            for chunk in _id_chunks(updated + created):
+                db_session.execute(delete(links).where(links.c.product_id.in_(chunk)))
+            done = 0
+            for chunk in _id_chunks(created):
+                db_session.execute(delete(products).where(products.c.id.in_(chunk)))
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
+
+            old_products, names = snapshots[products.name]
+            old_links, link_names = snapshots[links.name]
+            for chunk in _id_chunks(updated):
+                # The digest check guarantees these rows still exist, so only the snapshot's columns are set
+                db_session.execute(
+                    update(products).where(products.c.id == old_products.c.id, old_products.c.id.in_(chunk))
+                    .values({name: old_products.c[name] for name in names if name != 'id'})
+                )
+                # Categories deleted since the import can't be linked again
+                db_session.execute(insert(links).from_select(link_names, select(*old_links.c).where(
+                    old_links.c.product_id.in_(chunk), old_links.c.category_id.in_(select(Category.id))
+                )))
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
             db_session.commit()
-            report.insert(0, f"Import successful: {success_count} rows processed")
         except Exception:
-            # Rollback will happen automatically
-            report.insert(0, "Import failed: rolled back all changes")
+            db_session.rollback()
             raise
+    return f"Rollback successful: {len(updated)} products restored, {len(created)} created products removed"
+
+def apply_products_sheet(db_session, sheet: pd.DataFrame, progress=None, snapshot_path=None):
+    """Write a matched sheet in one transaction: bulk upsert, bulk insert and association rewrite.
+
+    `progress(done, total)` is called after every chunk of products; if it raises, nothing is committed.
+    With `snapshot_path` the product tables are first snapshotted there (PostgreSQL only) for a later rollback.
+    """
+    dialect = db_session.get_bind().dialect.name
+    if dialect not in _DIALECT_INSERTS:
+        raise NotImplementedError(f"Bulk import does not support the {dialect} dialect")
+    category_ids = sheet.attrs['category_ids']
+    updates, creates = _merge_sheet_rows(sheet)
+
+    products = Product.__table__
+    total = len(updates) + len(creates)
+    snapshot = False
+    try:
+        snapshot = bool(snapshot_path) and snapshot_product_tables(db_session, snapshot_path)
+        if progress:
+            progress(0, total)
+        if len(updates):
+            upsert = _DIALECT_INSERTS[dialect](products)
+            set_ = {column: upsert.excluded[column] for column in IMPORT_OVERWRITTEN_COLUMNS}
+            for column in IMPORT_OPTIONAL_COLUMNS:
+                set_[column] = func.coalesce(upsert.excluded[column], products.c[column])
+            upsert = upsert.on_conflict_do_update(index_elements=[products.c.id], set_=set_)
+            values = _product_values(updates)
+            for i in range(0, len(values), IMPORT_CHUNK_SIZE):
+                db_session.execute(upsert, values[i:i + IMPORT_CHUNK_SIZE])
+                if progress:
+                    progress(min(i + IMPORT_CHUNK_SIZE, len(values)), total)
+
+        if len(creates):
+            values = _product_values(creates)
+            for record in values:
+                del record['id']
+                record['availability_status'] = record['availability_status'] or AvailabilityStatus.IN_STOCK
+            # Ids come back in parameter order, so they line up with the rows
+            new_ids = []
+            for i in range(0, len(values), IMPORT_CHUNK_SIZE):
+                new_ids += db_session.scalars(
+                    insert(Product).returning(Product.id, sort_by_parameter_order=True), values[i:i + IMPORT_CHUNK_SIZE]
+                ).all()
+                if progress:
+                    progress(len(updates) + len(new_ids), total)
+            creates = creates.assign(product_id=new_ids)
 
+        # Rows with category names replace the product's categories; unknown names are ignored
+        with_categories = pd.concat([updates, creates], ignore_index=True)
+        with_categories = with_categories[with_categories['category_names'].notna()]
+        product_ids = with_categories['product_id'].astype(int).tolist()
+        for i in range(0, len(product_ids), IMPORT_CHUNK_SIZE):
+            db_session.execute(delete(product_categories_association).where(
+                product_categories_association.c.product_id.in_(product_ids[i:i + IMPORT_CHUNK_SIZE])
+            ))
+        pairs = _category_pairs(with_categories, category_ids)
+        if pairs:
+            db_session.execute(insert(product_categories_association), pairs)
+        if snapshot:
+            _write_snapshot_manifest(
+                db_session, snapshot_path, updates['product_id'].astype(int).tolist(), creates['product_id'].astype(int).tolist()
+            )
+        db_session.commit()
+    except Exception:
+        db_session.rollback()
+        if snapshot_path and os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+        raise
+
+def import_products_from_excel_sync(db_session, file_path: str, progress=None, snapshot_path=None):
+    """Sync version for Flask-Admin: Import products in one transaction with a few set-based statements."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File {file_path} not found")
+
+    sheet = normalize_products_sheet(pd.read_excel(file_path))
+    errors = sheet[sheet['error'].notna()]
+    if len(errors):
+        # Nothing is written while any row is invalid
+        raise ValueError("\n".join(
+            f"Row {row_num}: Error - {error}" for row_num, error in zip(errors['row_num'], errors['error'])
+        ))
+    sheet = match_products_sheet(db_session, sheet)
+    apply_products_sheet(db_session, sheet, progress, snapshot_path=snapshot_path)
+
+    messages = {
+        'skip': "Skipped - no ID, SKU, or Name",
+        'update': "Updated product {}",
+        'create': "Created new product {}",
+    }
+    report = [f"Import successful: {int((sheet['action'] != 'skip').sum())} rows processed"]
+    for row_num, action, name in zip(sheet['row_num'], sheet['action'], sheet['name']):
+        report.append(f"Row {row_num}: " + messages[action].format(name))
     return "\n".join(report)
 
+# Columns compared by the dry run, in sheet terms (farm and category names rather than ids)
+DIFF_COLUMNS = (
+    'name', 'name_de', 'price', 'unit', 'sku', 'availability_status', 'description', 'description_de',
+    'category_names', 'farm_name', 'image_path'
+)
+
+def load_products_frame(db_session) -> pd.DataFrame:
+    """Current products indexed by id, with farm and sorted category names, in two queries."""
+    current = pd.DataFrame(db_session.execute(
+        select(
+            Product.id, Product.name, Product.name_de, Product.price, Product.unit, Product.sku,
+            Product.availability_status, Product.description, Product.description_de,
+            Farm.name.label('farm_name'), Product.image_path
+        ).outerjoin(Farm, Product.farm_id == Farm.id)
+    ).all(), columns=['id', *[column for column in DIFF_COLUMNS if column != 'category_names']])
+    current['availability_status'] = current['availability_status'].map(lambda status: status.value if status else None)
+    links = pd.DataFrame(db_session.execute(
+        select(product_categories_association.c.product_id, Category.name)
+        .join(Category, Category.id == product_categories_association.c.category_id)
+    ).all(), columns=['id', 'category'])
+    current['category_names'] = current['id'].map(
+        links.sort_values('category').groupby('id')['category'].agg(', '.join)
+    ).fillna('')
+    return current.set_index('id')
+
+def _known_category_names(rows: pd.DataFrame, category_ids: dict) -> pd.Series:
+    # What the import would link: known names only, sorted; '' when none of them exist
+    names = rows['category_names'].str.split(',').explode().str.strip()
+    names = names[names.isin(category_ids.keys())]
+    known = names.groupby(level=0).agg(lambda group: ', '.join(sorted(set(group))))
+    return known.reindex(rows.index).fillna('').where(rows['category_names'].notna())
+
+def diff_products_sheet(db_session, file_path: str, progress=None) -> dict:
+    """Dry run of an import: what would be created, changed (per field) or rejected. Nothing is written."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File {file_path} not found")
+
+    sheet = match_products_sheet(db_session, normalize_products_sheet(pd.read_excel(file_path)))
+    category_ids = sheet.attrs['category_ids']
+    current = load_products_frame(db_session)
+    updates, creates = _merge_sheet_rows(sheet)
+
+    # New values as the import would write them, next to the current ones
+    updates = updates.astype({'product_id': 'int64'}).set_index('product_id')
+    old = current.reindex(updates.index)
+    new = pd.DataFrame(index=updates.index)
+    for column in ('name', 'price', 'unit', 'sku'):
+        new[column] = updates[column]
+    for column in ('name_de', 'description', 'description_de', 'image_path', 'availability_status'):
+        new[column] = updates[column].astype(object).where(updates[column].notna(), old[column])
+    new['farm_name'] = updates['farm_name'].astype(object).where(updates['farm_id'].notna(), old['farm_name'])
+    new['category_names'] = _known_category_names(updates, category_ids).astype(object).where(
+        updates['category_names'].notna(), old['category_names']
+    )
+
+    changes = []
+    changed_products = pd.Series(False, index=updates.index)
+    for column in DIFF_COLUMNS:
+        before, after = old[column].astype(object), new[column].astype(object)
+        differs = ~((before == after) | (before.isna() & after.isna()))
+        changed_products |= differs
+        if differs.any():
+            changes.append(pd.DataFrame({
+                'row_num': updates.loc[differs, 'row_num'],
+                'product_id': updates.index[differs],
+                'sku': new.loc[differs, 'sku'],
+                'name': new.loc[differs, 'name'],
+                'field': column,
+                'old': before[differs],
+                'new': after[differs],
+            }))
+    changes = pd.concat(changes, ignore_index=True) if changes else pd.DataFrame(
+        columns=['row_num', 'product_id', 'sku', 'name', 'field', 'old', 'new']
+    )
+    changes['sku'] = changes['sku'].where(changes['field'] != 'sku', changes['old'])
+    changes = changes.sort_values(['row_num', 'product_id'], kind='stable')
+
+    created = creates[['row_num', 'sku', 'name', 'price', 'unit', 'availability_status', 'farm_name']].copy()
+    created['availability_status'] = created['availability_status'].fillna(AvailabilityStatus.IN_STOCK.value)
+    created['farm_name'] = created['farm_name'].where(creates['farm_id'].notna())
+    created['category_names'] = _known_category_names(creates, category_ids)
+
+    errors = sheet.loc[sheet['action'] == 'error', ['row_num', 'error']]
+
+    # Names the import would silently ignore
+    farms = sheet[sheet['farm_name'].notna() & sheet['farm_id'].isna() & sheet['action'].isin(['create', 'update'])]
+    categories = sheet.loc[sheet['action'].isin(['create', 'update']), ['row_num', 'category_names']]
+    categories = categories.assign(category=categories['category_names'].str.split(',')).explode('category')
+    categories['category'] = categories['category'].str.strip()
+    categories = categories[categories['category'].notna() & (categories['category'] != '') & ~categories['category'].isin(category_ids.keys())]
+    warnings = pd.concat([
+        pd.DataFrame({'row_num': farms['row_num'], 'warning': "Unknown farm '" + farms['farm_name'] + "' is ignored"}),
+        pd.DataFrame({'row_num': categories['row_num'], 'warning': "Unknown category '" + categories['category'] + "' is ignored"}),
+    ], ignore_index=True).sort_values('row_num', kind='stable')
+
+    summary = {
+        'rows': len(sheet),
+        'created': len(creates),
+        'updated': int(changed_products.sum()),
+        'unchanged': int((~changed_products).sum()),
+        'changes': len(changes),
+        'errors': len(errors),
+        'skipped': int((sheet['action'] == 'skip').sum()),
+        'warnings': len(warnings),
+    }
+    if progress:
+        progress(len(sheet), len(sheet))
+    return {'summary': summary, 'changes': changes, 'created': created, 'errors': errors, 'warnings': warnings}
+
+def format_diff_summary(summary: dict) -> str:
+    return (
+        f"Dry run: {summary['created']} new, {summary['updated']} updated ({summary['changes']} field changes), "
+        f"{summary['unchanged']} unchanged, {summary['errors']} invalid, {summary['skipped']} skipped rows"
+    )
+
+def write_diff_report_xlsx(diff: dict, file_path: str):
+    """Save a dry-run result as a workbook with one sheet per section."""
+    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+        pd.DataFrame(list(diff['summary'].items()), columns=['metric', 'value']).to_excel(writer, sheet_name='Summary', index=False)
+        for section in ('changes', 'created', 'errors', 'warnings'):
+            diff[section].to_excel(writer, sheet_name=section.capitalize(), index=False)
+
 async def export_products_to_excel(file_path: str):
     """Export all products to an Excel file."""
     async with async_session() as session:
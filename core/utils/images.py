@@ -0,0 +1,160 @@
+import hashlib
+import os
+import re
+import threading
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    # Without Pillow every helper falls back to the original upload
+    Image = None
+
+# Resized derivatives of uploaded images.
+# Originals stay in static/uploads; derivatives live in static/derived/<variant>/<image_path>.<format>
+# and are (re)generated on upload, by the backfill script, or lazily on first request.
+
+UPLOADS_DIR = "static/uploads"
+DERIVED_DIR = "static/derived"
+
+# variant -> (max width, max height, crop to exactly that size)
+VARIANTS = {
+    'thumb': (100, 100, True),     # admin lists (shown at 50x50, sharp on retina screens)
+    'card': (600, 600, False),     # WebApp product/category/farm cards
+    'hero': (1280, 1280, False),   # WebApp farm header and bot photos (Telegram's own limit)
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpg': ('JPEG', {'quality': 85, 'progressive': True, 'optimize': True}),
+}
+
+# Part of every content hash: bump it when VARIANTS or FORMATS change so cached URLs move too
+ASSET_VERSION = '1'
+DIGEST_LENGTH = 12
+_DIGEST_RE = re.compile(rf'[0-9a-f]{{{DIGEST_LENGTH}}}')
+_digests = {}  # image_path -> (mtime_ns, size, digest)
+
+def source_path(image_path: str) -> str:
+    return os.path.join(UPLOADS_DIR, image_path)
+
+def derivative_path(image_path: str, variant: str, fmt: str) -> str:
+    return os.path.join(DERIVED_DIR, variant, f"{image_path}.{fmt}")
+
+def is_safe_image_path(image_path: str) -> bool:
+    # image_path comes from the database or a URL; never leave the uploads directory
+    normalized = os.path.normpath(image_path)
+    return bool(image_path) and not os.path.isabs(normalized) and not normalized.startswith('..')
+
+def ensure_derivative(image_path: str, variant: str, fmt: str):
+    """Return the path of an up-to-date derivative, generating it if needed; None if impossible."""
+    if Image is None or variant not in VARIANTS or fmt not in FORMATS or not is_safe_image_path(image_path):
+        return None
+    source = source_path(image_path)
+    target = derivative_path(image_path, variant, fmt)
+    try:
+        source_mtime = os.stat(source).st_mtime_ns
+    except OSError:
+        return None
+    try:
+        if os.stat(target).st_mtime_ns >= source_mtime:
+            return target
+    except OSError:
+        pass
+
+    width, height, crop = VARIANTS[variant]
+    pil_format, options = FORMATS[fmt]
+    tmp_target = None
+    try:
+        with Image.open(source) as image:
+            # Respect the camera orientation, then drop EXIF and alpha for the output
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGB')
+            if crop:
+                image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+            else:
+                image.thumbnail((width, height), Image.LANCZOS)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_target = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            image.save(tmp_target, pil_format, **options)
+        os.replace(tmp_target, target)
+    except Exception as e:
+        print(f"Error generating {variant}/{fmt} for {image_path}: {e}")
+        if tmp_target and os.path.exists(tmp_target):
+            os.remove(tmp_target)
+        return None
+    return target
+
+def generate_derivatives(image_path: str) -> list:
+    """Generate every variant and format of one upload; returns the paths written or already current."""
+    paths = []
+    for variant in VARIANTS:
+        for fmt in FORMATS:
+            path = ensure_derivative(image_path, variant, fmt)
+            if path:
+                paths.append(path)
+    return paths
+
+def remove_derivatives(image_path: str):
+    """Delete all derivatives of an upload (e.g. after it was replaced under another name)."""
+    for variant in VARIANTS:
+        for fmt in FORMATS:
+            try:
+                os.remove(derivative_path(image_path, variant, fmt))
+            except OSError:
+                pass
+
+def content_digest(image_path: str):
+    """Short hash of an upload's bytes (and of the derivative settings), or None if the file is missing."""
+    try:
+        stat = os.stat(source_path(image_path))
+    except OSError:
+        return None
+    cached = _digests.get(image_path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    digest = hashlib.sha1(ASSET_VERSION.encode('ascii'))
+    with open(source_path(image_path), 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    digest = digest.hexdigest()[:DIGEST_LENGTH]
+    _digests[image_path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+def image_url(image_path: str, variant: str = 'card', fmt: str = 'webp'):
+    """Content-hashed public URL of a derivative, or the original's URL without Pillow.
+
+    The hash changes whenever the upload does, so these URLs can be cached forever.
+    """
+    if not image_path:
+        return None
+    if Image is None:
+        return f"/static/uploads/{image_path}"
+    digest = content_digest(image_path)
+    if digest is None:
+        return f"/media/{variant}/{image_path}.{fmt}"
+    return f"/media/{variant}/{image_path}.{digest}.{fmt}"
+
+def image_srcset(image_path: str) -> str:
+    """srcset value offering the card and hero WebP derivatives by width (just the original without Pillow)."""
+    if not image_path:
+        return None
+    if Image is None:
+        return image_url(image_path)
+    return ', '.join(
+        f"{image_url(image_path, variant)} {VARIANTS[variant][0]}w" for variant in ('card', 'hero')
+    )
+
+def parse_media_filename(filename: str):
+    """Split '<image_path>[.<digest>].<fmt>' from a /media URL into (image_path, digest or None, fmt)."""
+    rest, _, fmt = filename.rpartition('.')
+    image_path, _, digest = rest.rpartition('.')
+    if image_path and _DIGEST_RE.fullmatch(digest):
+        return image_path, digest, fmt
+    return rest, None, fmt
+
+def bot_photo_path(image_path: str):
+    """Local file the bot should upload: the JPEG hero derivative, or the original as a fallback."""
+    path = ensure_derivative(image_path, 'hero', 'jpg')
+    if path:
+        return path
+    source = source_path(image_path)
+    return source if os.path.exists(source) else None
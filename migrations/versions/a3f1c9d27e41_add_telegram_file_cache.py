@@ -0,0 +1,38 @@
+"""Add Telegram file_id cache for uploaded images
+
+Revision ID: a3f1c9d27e41
+Revises: 6468c17308f7
+Create Date: 2026-10-18 10:12:31.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f1c9d27e41'
+down_revision: Union[str, Sequence[str], None] = '6468c17308f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('telegram_file_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('image_path', sa.String(length=255), nullable=False),
+    sa.Column('mtime_ns', sa.BigInteger(), nullable=False),
+    sa.Column('file_id', sa.String(length=255), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('image_path')
+    )
+    op.create_index(op.f('ix_telegram_file_cache_id'), 'telegram_file_cache', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_telegram_file_cache_id'), table_name='telegram_file_cache')
+    op.drop_table('telegram_file_cache')
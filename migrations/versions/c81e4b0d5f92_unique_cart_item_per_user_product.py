@@ -0,0 +1,48 @@
+"""Unique cart item per (user_id, product_id)
+
+Revision ID: c81e4b0d5f92
+Revises: a3f1c9d27e41
+Create Date: 2026-10-18 11:04:52.118306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81e4b0d5f92'
+down_revision: Union[str, Sequence[str], None] = 'a3f1c9d27e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Merge duplicate rows created by concurrent taps into the oldest row
+    op.execute("""
+        UPDATE cart_items AS keep
+        SET quantity = dup.total
+        FROM (
+            SELECT MIN(id) AS id, SUM(quantity) AS total
+            FROM cart_items
+            GROUP BY user_id, product_id
+            HAVING COUNT(*) > 1
+        ) AS dup
+        WHERE keep.id = dup.id
+    """)
+    op.execute("""
+        DELETE FROM cart_items AS c
+        USING cart_items AS keep
+        WHERE c.user_id = keep.user_id
+          AND c.product_id = keep.product_id
+          AND c.id > keep.id
+    """)
+    # The unique constraint is backed by a composite (user_id, product_id) index
+    op.create_unique_constraint('uq_cart_items_user_product', 'cart_items', ['user_id', 'product_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_cart_items_user_product', 'cart_items', type_='unique')
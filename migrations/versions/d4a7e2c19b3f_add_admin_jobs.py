@@ -0,0 +1,49 @@
+"""Add admin background jobs
+
+Revision ID: d4a7e2c19b3f
+Revises: c81e4b0d5f92
+Create Date: 2026-10-18 12:26:08.513942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7e2c19b3f'
+down_revision: Union[str, Sequence[str], None] = 'c81e4b0d5f92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('admin_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', 'CANCELLED', name='jobstatus'), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('rows_done', sa.Integer(), nullable=True),
+    sa.Column('rows_total', sa.Integer(), nullable=True),
+    sa.Column('errors_count', sa.Integer(), nullable=True),
+    sa.Column('cancel_requested', sa.Boolean(), nullable=True),
+    sa.Column('input_path', sa.String(length=255), nullable=True),
+    sa.Column('result_path', sa.String(length=255), nullable=True),
+    sa.Column('result', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_admin_jobs_id'), 'admin_jobs', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_admin_jobs_id'), table_name='admin_jobs')
+    op.drop_table('admin_jobs')
+    sa.Enum(name='jobstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,28 @@
+"""Add snapshot path to admin jobs
+
+Revision ID: e7b3c5a91d20
+Revises: d4a7e2c19b3f
+Create Date: 2026-10-18 14:02:37.184520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b3c5a91d20'
+down_revision: Union[str, Sequence[str], None] = 'd4a7e2c19b3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('admin_jobs', sa.Column('snapshot_path', sa.String(length=255), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('admin_jobs', 'snapshot_path')
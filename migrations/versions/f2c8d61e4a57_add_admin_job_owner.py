@@ -0,0 +1,28 @@
+"""Add owner to admin jobs
+
+Revision ID: f2c8d61e4a57
+Revises: e7b3c5a91d20
+Create Date: 2026-10-18 16:41:09.502318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8d61e4a57'
+down_revision: Union[str, Sequence[str], None] = 'e7b3c5a91d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('admin_jobs', sa.Column('owner', sa.String(length=120), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('admin_jobs', 'owner')
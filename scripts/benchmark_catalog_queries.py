@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+
+# Додаємо шлях до кореня, щоб Python бачив папку core
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# core.database builds an async engine at import time; it is never connected here
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://benchmark@localhost/benchmark")
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session
+from core.database import Base
+from core.models import Product, Category, Farm, Region, AvailabilityStatus
+from core.utils.catalog import serialize_products
+
+SIZES = [10, 100, 1000, 10000]
+
+def seed(session, products_count):
+    region = Region(name="Osnabrück", name_de="Osnabrück", slug="osnabruck")
+    farms = [Farm(name=f"Farm {i}", region=region) for i in range(10)]
+    categories = [Category(name=f"Категорія {i}", name_de=f"Kategorie {i}", slug=f"cat-{i}") for i in range(8)]
+    session.add_all([region, *farms, *categories])
+    for i in range(products_count):
+        session.add(Product(
+            name=f"Продукт {i}", name_de=f"Produkt {i}", price=9.99, unit="кг", sku=f"SKU-{i}",
+            description="Опис " * 20, description_de="Beschreibung " * 20,
+            availability_status=AvailabilityStatus.IN_STOCK,
+            farm=farms[i % len(farms)],
+            categories=[categories[i % len(categories)], categories[(i + 3) % len(categories)]]
+        ))
+    session.commit()
+
+def serialize_products_lazy(session):
+    """The previous api_products implementation: lazy-loads categories and farm per product."""
+    products = session.execute(
+        select(Product).where(Product.availability_status == AvailabilityStatus.IN_STOCK).order_by(Product.id)
+    ).scalars().all()
+    data = []
+    for product in products:
+        data.append({
+            'id': product.id,
+            'categories': [cat.name for cat in product.categories],
+            'categories_de': [cat.name_de for cat in product.categories] if product.categories else [],
+            'farm_name': product.farm.name if product.farm else None,
+            'farm_name_de': product.farm.name if product.farm else None,
+        })
+    return data
+
+def measure(engine, fn):
+    counter = {"queries": 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counter["queries"] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        with Session(engine) as session:
+            started = time.perf_counter()
+            rows = fn(session)
+            elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return counter["queries"], elapsed, len(rows)
+
+def main():
+    print(f"{'products':>9} | {'lazy queries':>12} {'lazy ms':>9} | {'eager queries':>13} {'eager ms':>9}")
+    for size in SIZES:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            seed(session, size)
+        lazy_queries, lazy_time, _ = measure(engine, serialize_products_lazy)
+        eager_queries, eager_time, rows = measure(engine, serialize_products)
+        assert rows == size
+        print(f"{size:>9} | {lazy_queries:>12} {lazy_time * 1000:>9.1f} | {eager_queries:>13} {eager_time * 1000:>9.1f}")
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import os
+import random
+import sys
+import time
+
+# Додаємо шлях до кореня, щоб Python бачив папку core
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# core.database builds an async engine at import time; it is never connected here
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://benchmark@localhost/benchmark")
+
+from core.utils.catalog_search import CatalogSearchIndex
+
+PRODUCTS = 50000
+QUERIES = [
+    'ковб', 'свиняча ковбаса', "м'ясо", 'яловичина', 'schwein', 'wurst', 'grüne', 'gruene',
+    'rind hof', 'müller', 'mueller', 'sku-123', 'k', 's', 'homeyer', 'копчен', 'wurst k', 'kalb s 12', 'zzz'
+]
+
+WORDS_UK = ['свиняча', 'ковбаса', 'яловичина', 'телятина', "м'ясо", 'копчена', 'домашня', 'курятина', 'сир', 'масло']
+WORDS_DE = ['Schweine', 'Wurst', 'Rindfleisch', 'Kalb', 'Fleisch', 'geräuchert', 'hausgemacht', 'Hähnchen', 'Käse', 'Grüne']
+FARMS = ['Homeyer', 'Müller Hof', 'Bauer Schulte', 'Hof Große-Kleine']
+CATEGORIES = [('Свинина', 'Schwein'), ('Яловичина', 'Rind'), ('Ковбаси', 'Würste'), ('Птиця', 'Geflügel')]
+
+def make_products(count):
+    rng = random.Random(42)
+    for i in range(count):
+        category, category_de = CATEGORIES[i % len(CATEGORIES)]
+        yield {
+            'id': i + 1,
+            'name': ' '.join(rng.sample(WORDS_UK, 2)) + f' {i}',
+            'name_de': ' '.join(rng.sample(WORDS_DE, 2)) + f' {i}',
+            'sku': f'SKU-{i}',
+            'price': 9.99,
+            'unit': 'кг',
+            'description': ' '.join(rng.choices(WORDS_UK, k=12)),
+            'description_de': ' '.join(rng.choices(WORDS_DE, k=12)) + ' vom Hof',
+            'categories': [category],
+            'categories_de': [category_de],
+            'farm_name': FARMS[i % len(FARMS)],
+            'image_path': f'product_{i}.jpg',
+        }
+
+def main():
+    index = CatalogSearchIndex()
+    started = time.perf_counter()
+    index.build(make_products(PRODUCTS))
+    print(f"Index of {PRODUCTS} products built in {(time.perf_counter() - started) * 1000:.0f} ms: {index.stats()}")
+
+    # First run of a word also ranks its product list once; later runs reuse it
+    print(f"{'query':>18} | {'hits':>5} | {'cold ms':>8} | {'warm ms':>8}")
+    timings = []
+    for query in QUERIES:
+        runs = []
+        for _ in range(2):
+            started = time.perf_counter()
+            hits = index.search(query, lang='de')
+            runs.append((time.perf_counter() - started) * 1000)
+        timings.append(runs[1])
+        print(f"{query:>18} | {len(hits):>5} | {runs[0]:>8.2f} | {runs[1]:>8.2f}")
+
+    timings.sort()
+    print(f"warm: p50 {timings[len(timings) // 2]:.2f} ms, max {timings[-1]:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+import time
+
+# Додаємо шлях до кореня, щоб Python бачив папку core
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# core.database builds an async engine at import time; it is never connected here
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://benchmark@localhost/benchmark")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from core.database import Base
+from core.utils.catalog import serialize_products, serialize_categories, serialize_farms
+from admin.compression import compress, ENCODINGS
+from benchmark_catalog_queries import seed
+
+SIZES = [100, 1000]
+SHELL_PATH = os.path.join(os.path.dirname(__file__), '..', 'templates', 'webapp', 'index.html')
+
+def dumps(data) -> bytes:
+    # Same encoding as the catalog snapshot
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def report(label, body):
+    row = f"{label:>28} | {len(body):>9}"
+    for encoding in ENCODINGS:
+        started = time.perf_counter()
+        compressed = compress(body, encoding, best=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        row += f" | {len(compressed):>9} {len(compressed) / len(body):>6.1%} {elapsed:>7.1f} ms"
+    print(row)
+
+def main():
+    header = f"{'payload':>28} | {'identity':>9}"
+    for encoding in ENCODINGS:
+        header += f" | {encoding + ' bytes':>9} {'ratio':>6} {'once':>10}"
+    print(header)
+
+    with open(SHELL_PATH, 'rb') as f:
+        report('webapp shell (index.html)', f.read())
+
+    for size in SIZES:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            seed(session, size)
+            report(f'products, {size}', dumps(serialize_products(session)))
+            report(f'products page of 24, {size}', dumps(serialize_products(session, limit=24)))
+            report(f'farms + categories, {size}', dumps([serialize_farms(session), serialize_categories(session)]))
+        engine.dispose()
+
+    print("Cached payloads are compressed once per encoding; later requests only send the stored bytes.")
+
+if __name__ == "__main__":
+    main()
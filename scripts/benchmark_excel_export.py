@@ -0,0 +1,82 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Додаємо шлях до кореня, щоб Python бачив папку core
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# core.database builds an async engine at import time; it is never connected here
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://benchmark@localhost/benchmark")
+
+import pandas as pd
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session
+from core.database import Base
+from core.models import Product
+from core.utils.excel_manager import export_products_to_excel_sync
+from benchmark_catalog_queries import seed
+
+SIZES = [1000, 10000, 30000]
+
+def export_products_dataframe(session, file_path):
+    """The previous export: every product (categories and farm lazy-loaded per row) in a list, then a DataFrame."""
+    products = session.execute(select(Product).order_by(Product.id)).scalars().all()
+    data = []
+    for p in products:
+        data.append({
+            'id': p.id,
+            'name': p.name,
+            'name_de': p.name_de,
+            'price': p.price,
+            'unit': p.unit,
+            'sku': p.sku,
+            'availability_status': p.availability_status.value if p.availability_status else None,
+            'description': p.description,
+            'description_de': p.description_de,
+            'category_names': ", ".join([c.name for c in p.categories]) if p.categories else None,
+            'farm_name': p.farm.name if p.farm else None,
+            'image_path': p.image_path
+        })
+    pd.DataFrame(data).to_excel(file_path, index=False)
+
+def measure(engine, fn):
+    counter = {"queries": 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counter["queries"] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        with Session(engine) as session:
+            tracemalloc.start()
+            started = time.perf_counter()
+            fn(session, path)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+        os.unlink(path)
+    return counter["queries"], elapsed, peak
+
+def main():
+    print(f"{'products':>9} | {'old queries':>11} {'old s':>7} {'old peak':>9} | {'new queries':>11} {'new s':>7} {'new peak':>9}")
+    for size in SIZES:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            seed(session, size)
+        old = measure(engine, export_products_dataframe)
+        new = measure(engine, lambda session, path: export_products_to_excel_sync(session, path))
+        print(
+            f"{size:>9} | {old[0]:>11} {old[1]:>7.1f} {old[2] / 2**20:>7.1f}MB"
+            f" | {new[0]:>11} {new[1]:>7.1f} {new[2] / 2**20:>7.1f}MB"
+        )
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import os
+import sys
+import tempfile
+import time
+
+# Додаємо шлях до кореня, щоб Python бачив папку core
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# core.database builds an async engine at import time; it is never connected here
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://benchmark@localhost/benchmark")
+
+import pandas as pd
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session, selectinload
+from core.database import Base
+from core.models import Product, Category, Farm, AvailabilityStatus
+from core.utils.excel_manager import import_products_from_excel_sync
+from benchmark_catalog_queries import seed
+
+# (products in the database, rows in the supplier sheet: half updates by SKU, half new products)
+SIZES = [(1000, 1000), (5000, 5000)]
+
+def import_products_row_by_row(db_session, file_path: str):
+    """The previous importer: iterrows() with a SELECT per row, category name and farm name."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File {file_path} not found")
+
+    df = pd.read_excel(file_path)
+
+    report = []
+    success_count = 0
+
+    # Use nested transaction for atomicity
+    with db_session.begin_nested():
+        try:
+            for index, row in df.iterrows():
+                row_num = index + 2  # Assuming header is row 1
+                product_id = row.get('id')
+                sku = row.get('sku')
+                name = row.get('name')
+
+                # Skip invalid rows
+                if pd.isna(product_id) and pd.isna(sku) and pd.isna(name):
+                    report.append(f"Row {row_num}: Skipped - no ID, SKU, or Name")
+                    continue
+
+                # Find existing product: by id first, then by sku
+                existing_product = None
+                if not pd.isna(product_id):
+                    existing_product = db_session.execute(select(Product).where(Product.id == int(product_id))).scalar_one_or_none()
+                if not existing_product and not pd.isna(sku):
+                    existing_product = db_session.execute(select(Product).where(Product.sku == str(sku))).scalar_one_or_none()
+
+                try:
+                    # Validation
+                    name_val = str(row.get('name')).strip() if not pd.isna(row.get('name')) else None
+                    if not name_val:
+                        raise ValueError("Name cannot be empty")
+                    price_val = float(row.get('price')) if not pd.isna(row.get('price')) else 0.0
+                    if price_val < 0:
+                        raise ValueError("Price cannot be negative")
+                    unit_val = str(row.get('unit')).strip() if not pd.isna(row.get('unit')) else 'kg'
+                    if not unit_val:
+                        raise ValueError("Unit cannot be empty")
+                    sku_val = str(row.get('sku')).strip() if not pd.isna(row.get('sku')) else None
+                    if sku_val and len(sku_val) > 50:
+                        raise ValueError("SKU cannot be longer than 50 characters")
+
+                    if existing_product:
+                        # Update existing
+                        existing_product.name = name_val
+                        if not pd.isna(row.get('name_de')):
+                            existing_product.name_de = str(row.get('name_de')).strip()
+                        existing_product.price = price_val
+                        existing_product.unit = unit_val
+                        existing_product.sku = sku_val
+                        if not pd.isna(row.get('description')):
+                            existing_product.description = str(row.get('description')).strip()
+                        if not pd.isna(row.get('description_de')):
+                            existing_product.description_de = str(row.get('description_de')).strip()
+                        if not pd.isna(row.get('image_path')):
+                            existing_product.image_path = str(row.get('image_path')).strip()
+                        if not pd.isna(row.get('availability_status')):
+                            existing_product.availability_status = AvailabilityStatus(str(row.get('availability_status')))
+                        # Link relationships by name (multiple categories)
+                        if not pd.isna(row.get('category_names')):
+                            category_names = [name.strip() for name in str(row.get('category_names')).split(',') if name.strip()]
+                            categories = []
+                            for cat_name in category_names:
+                                category = db_session.execute(select(Category).where(Category.name == cat_name)).scalar_one_or_none()
+                                if category:
+                                    categories.append(category)
+                            existing_product.categories = categories
+                        if not pd.isna(row.get('farm_name')):
+                            farm = db_session.execute(select(Farm).where(Farm.name == str(row.get('farm_name')))).scalar_one_or_none()
+                            if farm:
+                                existing_product.farm_id = farm.id
+                        report.append(f"Row {row_num}: Updated product {existing_product.name}")
+                    else:
+                        # Create new
+                        new_product = Product(
+                            name=name_val,
+                            name_de=str(row.get('name_de')).strip() if not pd.isna(row.get('name_de')) else None,
+                            price=price_val,
+                            unit=unit_val,
+                            sku=sku_val,
+                            description=str(row.get('description')).strip() if not pd.isna(row.get('description')) else None,
+                            description_de=str(row.get('description_de')).strip() if not pd.isna(row.get('description_de')) else None,
+                            image_path=str(row.get('image_path')).strip() if not pd.isna(row.get('image_path')) else None
+                        )
+                        # Set availability_status if provided
+                        if not pd.isna(row.get('availability_status')):
+                            new_product.availability_status = AvailabilityStatus(str(row.get('availability_status')))
+                        # Link relationships by name (multiple categories)
+                        if not pd.isna(row.get('category_names')):
+                            category_names = [name.strip() for name in str(row.get('category_names')).split(',') if name.strip()]
+                            categories = []
+                            for cat_name in category_names:
+                                category = db_session.execute(select(Category).where(Category.name == cat_name)).scalar_one_or_none()
+                                if category:
+                                    categories.append(category)
+                            new_product.categories = categories
+                        if not pd.isna(row.get('farm_name')):
+                            farm = db_session.execute(select(Farm).where(Farm.name == str(row.get('farm_name')))).scalar_one_or_none()
+                            if farm:
+                                new_product.farm_id = farm.id
+                        db_session.add(new_product)
+                        report.append(f"Row {row_num}: Created new product {name}")
+                    success_count += 1
+                except Exception as e:
+                    report.append(f"Row {row_num}: Error - {str(e)}")
+                    raise  # Rollback the nested transaction
+
+            # If no errors, commit the nested transaction
+            db_session.commit()
+            report.insert(0, f"Import successful: {success_count} rows processed")
+        except Exception:
+            # Rollback will happen automatically
+            report.insert(0, "Import failed: rolled back all changes")
+            raise
+
+    return "\n".join(report)
+
+def write_sheet(path, existing, rows):
+    data = []
+    for i in range(rows):
+        # Even rows update existing products by SKU, odd rows are new products
+        sku = f"SKU-{i // 2 % existing}" if i % 2 == 0 else f"NEW-{i}"
+        data.append({
+            'id': None, 'name': f"Продукт {i} (оновлено)", 'name_de': f"Produkt {i}", 'price': 1.5 + i % 7,
+            'unit': 'кг', 'sku': sku, 'availability_status': 'OUT_OF_STOCK' if i % 5 == 0 else None,
+            'description': None, 'description_de': f"Beschreibung {i}",
+            'category_names': f"Категорія {i % 8}, Категорія {(i + 1) % 8}" if i % 3 else None,
+            'farm_name': f"Farm {i % 10}", 'image_path': None
+        })
+    pd.DataFrame(data).to_excel(path, index=False)
+
+def snapshot(session):
+    """Comparable state of the product table after an import."""
+    products = session.execute(select(Product).options(selectinload(Product.categories)).order_by(Product.sku)).scalars()
+    return [
+        (p.sku, p.name, p.name_de, p.price, p.unit, p.availability_status, p.description, p.description_de,
+         p.farm_id, sorted(c.id for c in p.categories))
+        for p in products
+    ]
+
+def measure(existing, path, fn):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, existing)
+    counter = {"queries": 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counter["queries"] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    with Session(engine) as session:
+        started = time.perf_counter()
+        fn(session, path)
+        elapsed = time.perf_counter() - started
+    event.remove(engine, "before_cursor_execute", count)
+    with Session(engine) as session:
+        state = snapshot(session)
+    engine.dispose()
+    return counter["queries"], elapsed, state
+
+def main():
+    print(f"{'products':>8} {'rows':>6} | {'old queries':>11} {'old s':>7} | {'new queries':>11} {'new s':>7} | same result")
+    for existing, rows in SIZES:
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        try:
+            write_sheet(path, existing, rows)
+            old = measure(existing, path, import_products_row_by_row)
+            new = measure(existing, path, import_products_from_excel_sync)
+        finally:
+            os.unlink(path)
+        print(
+            f"{existing:>8} {rows:>6} | {old[0]:>11} {old[1]:>7.2f} | {new[0]:>11} {new[1]:>7.2f} | "
+            f"{'yes' if old[2] == new[2] else 'NO'}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+
+# Додаємо кореневу директорію проекту до шляхів пошуку модулів
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.utils import images
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+def main():
+    # Paths in core.utils.images are relative to the project root
+    os.chdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    if images.Image is None:
+        print("❌ Pillow не встановлено: pip install Pillow")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    originals = derived = generated = failed = 0
+    for root, _, files in os.walk(images.UPLOADS_DIR):
+        for name in sorted(files):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            image_path = os.path.relpath(os.path.join(root, name), images.UPLOADS_DIR)
+            originals += os.path.getsize(images.source_path(image_path))
+            before = time.time_ns()
+            paths = images.generate_derivatives(image_path)
+            expected = len(images.VARIANTS) * len(images.FORMATS)
+            failed += expected - len(paths)
+            for path in paths:
+                if os.stat(path).st_mtime_ns >= before:
+                    generated += 1
+                if path.endswith('.webp') and f"{os.sep}card{os.sep}" in path:
+                    derived += os.path.getsize(path)
+            print(f"✅ {image_path}: {len(paths)}/{expected}")
+
+    print(f"Згенеровано {generated} файлів, помилок: {failed}, за {time.perf_counter() - started:.1f} с")
+    if originals:
+        print(f"Оригінали: {originals / 1024:.0f} KB, картки WebP: {derived / 1024:.0f} KB ({derived / originals:.0%})")
+
+if __name__ == "__main__":
+    main()